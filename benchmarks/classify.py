@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Compare the per-line cost of the first-character block classifier with
+the if/elif chain it replaced, over long documents, and check that both
+produce the same blocks.
+
+    python -m benchmarks.classify
+    python -m benchmarks.classify --size 5000000 --mix prose=1
+"""
+
+import sys
+from argparse import ArgumentParser
+from timeit import Timer
+
+from syntaq import Block, Heading, HorizontalRule, ListItem, Literal, Parser, Quote, TableRow
+
+from benchmarks.corpus import generate
+
+
+class ChainParser(Parser):
+
+    def classify(self, line):
+        append = self.append
+        if self.context.content_type is Literal:
+            return self.parse_literal(line)
+        elif self.context.content_type is Quote:
+            return self.parse_quote(line)
+        else:
+            line = line.rstrip()
+            stripped_line = line.lstrip()
+            if Heading.check(line):
+                append(self.context)
+                self.context = Block()
+                source = Heading(line)
+                append(Block(Heading, lines=[source]))
+                if not (self.heading and self.heading.text.source) or source.level < self.title_level:
+                    self.heading, self.title_level = source, source.level
+                return Heading
+            elif line.startswith("----"):
+                append(self.context)
+                self.context = Block()
+                append(Block(HorizontalRule, lines=[HorizontalRule(line)]))
+                return HorizontalRule
+            elif ListItem.check(stripped_line, self.context.content_type):
+                if not self.within_nesting(stripped_line):
+                    return self.parse_paragraph(line)
+                source = ListItem(stripped_line)
+                if not (self.context and self.context.content_type is ListItem and
+                        self.context.lines[0].compatible(source)):
+                    append(self.context)
+                    self.context = Block(ListItem)
+                self.context.lines.append(source)
+                return ListItem
+            elif line.startswith(Literal.BLOCK_DELIMITER):
+                metadata = line.lstrip("`").strip()
+                append(self.context)
+                self.context = Block(Literal, metadata=metadata)
+                return Literal
+            elif line.startswith(Quote.BLOCK_DELIMITER):
+                metadata = line.lstrip('"').strip()
+                append(self.context)
+                self.context = Block(Quote, metadata=metadata)
+                return Quote
+            elif line.startswith("|"):
+                row = TableRow(line)
+                if not self.within_cells(row):
+                    return self.parse_paragraph(line)
+                if self.context.content_type is not TableRow:
+                    append(self.context)
+                    self.context = Block(TableRow)
+                self.context.lines.append(row)
+                return TableRow
+            else:
+                return self.parse_paragraph(line)
+
+
+PARSERS = (
+    ("chain", ChainParser),
+    ("dispatch", Parser),
+)
+
+
+def classify_all(parser_class, lines):
+    parser = parser_class()
+    for line in lines:
+        parser.classify(line)
+    parser.close()
+    return parser
+
+
+def main(argv=None):
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=1000000, help="synthetic document size in bytes")
+    parser.add_argument("--mix", default="prose=1", help="feature weights, e.g. prose=4,tables=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    lines = generate(args.size, args.mix, args.seed).splitlines(True)
+    fingerprints = {name: [block.fingerprint for block in classify_all(parser_class, lines).blocks]
+                    for name, parser_class in PARSERS}
+    if len(set(map(tuple, fingerprints.values()))) != 1:
+        sys.exit("Parsers disagree on block output")
+
+    sys.stdout.write("{0} lines, {1} blocks\n".format(len(lines), len(fingerprints["dispatch"])))
+    for name, parser_class in PARSERS:
+        seconds = min(Timer(lambda: classify_all(parser_class, lines)).repeat(args.repeat, 1))
+        sys.stdout.write("{0:<10} {1:>10.4f} s {2:>10.1f} ns/line\n".format(
+            name, seconds, 1e9 * seconds / len(lines)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Synthetic Syntaq document generator.
+
+Documents are built from a weighted mix of features until they reach the
+requested size. Output is deterministic for a given size, mix and seed.
+"""
+
+from glob import glob
+from os.path import basename, dirname, join, splitext
+from random import Random
+
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud").split()
+
+LANGUAGES = ("python", "javascript", "bash", "ini", "no-such-language", "")
+
+CODE_SAMPLES = (
+    "pip install syntaq\n",
+    "def fibonacci():\n    a, b = 0, 1\n    while True:\n        yield a\n        a, b = b, a + b\n",
+    "[server]\nhost = localhost\nport = 8080\n",
+    "for (var i = 0; i < 10; i++) {\n    console.log(i);\n}\n",
+)
+
+BUNDLED = join(dirname(dirname(__file__)), "content")
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def heading(rng):
+    return "%s %s\n\n" % ("=" * rng.randint(1, 4), words(rng, rng.randint(2, 6)).title())
+
+
+def prose(rng):
+    lines = [words(rng, rng.randint(8, 16)) for _ in range(rng.randint(2, 6))]
+    return "\n".join(lines) + "\n\n"
+
+
+def inline(rng):
+    markup = ("**%s**", "//%s//", "^^%s^^", "__%s__", '""%s""', "``%s``", "[[%s]]", "[[http://example.com/%s|link]]",
+              "~**%s~**", "%s \\\\")
+    bits = []
+    for _ in range(rng.randint(20, 40)):
+        bits.append(rng.choice(markup) % words(rng, rng.randint(1, 3)) if rng.random() < 0.5 else rng.choice(WORDS))
+    return " ".join(bits) + "\n\n"
+
+
+def lists(rng):
+    lines = []
+    signature = ""
+    for _ in range(rng.randint(5, 20)):
+        depth = max(1, min(8, len(signature) + rng.choice((-1, 0, 1, 1))))
+        signature = (signature + rng.choice("*#") * depth)[:depth]
+        lines.append("%s %s" % (signature, words(rng, rng.randint(2, 8))))
+    return "\n".join(lines) + "\n\n"
+
+
+def tables(rng):
+    width = rng.randint(5, 20)
+    lines = ["|" + "|".join("=" + words(rng, 1) for _ in range(width)) + "|"]
+    for _ in range(rng.randint(5, 30)):
+        cells = []
+        for _ in range(width):
+            cell = words(rng, rng.randint(1, 3))
+            cells.append(rng.choice(("%s", " %s", "%s ", " %s ", "**%s**", "``%s``")) % cell)
+        lines.append("|" + "|".join(cells) + "|")
+    return "\n".join(lines) + "\n\n"
+
+
+def code(rng):
+    return "``` %s\n%s```\n\n" % (rng.choice(LANGUAGES), rng.choice(CODE_SAMPLES))
+
+
+def urls(rng):
+    bits = []
+    for _ in range(rng.randint(3, 8)):
+        path = "/".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+        bits.append("%s see http://www.example.com/%s?q=%s#%s (%s)" % (
+            words(rng, 4), path, rng.choice(WORDS), rng.choice(WORDS), words(rng, 2)))
+    return " ".join(bits) + "\n\n"
+
+
+FEATURES = {
+    "headings": heading,
+    "prose": prose,
+    "inline": inline,
+    "lists": lists,
+    "tables": tables,
+    "code": code,
+    "urls": urls,
+}
+
+DEFAULT_MIX = "headings=1,prose=4,inline=2,lists=1,tables=1,code=1,urls=1"
+
+
+def parse_mix(mix):
+    weights = []
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name not in FEATURES:
+            raise ValueError("Unknown feature %r (choose from %s)" % (name, ", ".join(sorted(FEATURES))))
+        weights.append((name, float(weight or 1)))
+    return weights
+
+
+def generate(size, mix=DEFAULT_MIX, seed=0):
+    rng = Random(seed)
+    weights = parse_mix(mix)
+    names = [name for name, _ in weights]
+    cumulative = []
+    total = 0.0
+    for _, weight in weights:
+        total += weight
+        cumulative.append(total)
+    chunks = []
+    length = 0
+    while length < size:
+        point = rng.random() * total
+        name = names[next(i for i, c in enumerate(cumulative) if point < c)]
+        chunk = FEATURES[name](rng)
+        chunks.append(chunk)
+        length += len(chunk)
+    return "".join(chunks)
+
+
+def bundled():
+    for path in sorted(glob(join(BUNDLED, "*.syntaq"))):
+        with open(path) as f:
+            yield splitext(basename(path))[0], f.read()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Compare HTML entity escaping strategies across text sizes and escape
+densities, and time HTML.write_text end to end.
+
+    python -m benchmarks.escaping
+"""
+
+import re
+from timeit import Timer
+
+from syntaq import HTML
+
+
+ENTITIES = {"&": "&amp;", "'": "&apos;", "\"": "&quot;", "<": "&lt;", ">": "&gt;"}
+ENTITY_TABLE = str.maketrans(ENTITIES)
+ENTITY_PATTERN = re.compile("[&'\"<>]")
+
+SIZES = (100, 10000, 1000000)
+DENSITIES = (0.0, 0.01, 0.1, 0.5)
+
+
+def char_loop(text):
+    chars = list(text)
+    for i, ch in enumerate(chars):
+        if ch in ENTITIES:
+            chars[i] = ENTITIES[ch]
+    return "".join(chars)
+
+
+def translate(text):
+    return text.translate(ENTITY_TABLE)
+
+
+def regex(text):
+    return ENTITY_PATTERN.sub(lambda match: ENTITIES[match.group()], text)
+
+
+def char_loop_writer(text):
+    tokens = []
+    tokens.extend(char_loop(text))
+    return "".join(tokens)
+
+
+def writer(text):
+    out = HTML()
+    out.write_text(text)
+    return out.html
+
+
+CANDIDATES = [
+    ("char loop", char_loop),
+    ("translate", translate),
+    ("regex", regex),
+    ("HTML.entities", HTML.entities),
+    ("char loop writer", char_loop_writer),
+    ("HTML.write_text", writer),
+]
+
+
+def sample(size, density):
+    specials = "&'\"<>"
+    period = int(1 / density) if density else 0
+    chars = []
+    for i in range(size):
+        if period and i % period == 0:
+            chars.append(specials[i % len(specials)])
+        else:
+            chars.append("abcdefghij "[i % 11])
+    return "".join(chars)
+
+
+def main():
+    print("{0:>8} {1:>8} {2:>18} {3:>12}".format("size", "density", "implementation", "ms"))
+    for size in SIZES:
+        number = max(1, 100000 // size)
+        for density in DENSITIES:
+            text = sample(size, density)
+            expected = char_loop(text)
+            for name, function in CANDIDATES:
+                assert function(text) == expected
+                seconds = min(Timer(lambda: function(text)).repeat(3, number)) / number
+                print("{0:>8} {1:>8} {2:>18} {3:>12.4f}".format(size, density, name, 1000 * seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Compare memory allocated while rendering inline text by the token-based
+renderer, which lexes into substring copies, with the span-based renderer,
+which lexes (start, end, marker) offsets into the original source.
+
+    python -m benchmarks.inline_allocation
+"""
+
+import tracemalloc
+from timeit import Timer
+
+from syntaq import BRACKET_TOKENS, HTML, SIMPLE_TOKENS, TEXT_LEXER, TOGGLE_TOKENS, Text, auto_link
+
+
+SIZES = (1000, 10000, 100000, 1000000)
+FRAGMENTS = {
+    "markup": "**bold** plain //italic// text [[http://example.com/|link]] ~**escaped~** ",
+    "prose": "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor ",
+}
+
+
+def token_html(source):
+    out = HTML(processor=auto_link)
+    tokens = iter(list(TEXT_LEXER.tokens(source)))
+    for token in tokens:
+        if token[0] == "~":
+            out.write_text(token[1:])
+        elif token in SIMPLE_TOKENS:
+            out.write_html(SIMPLE_TOKENS[token])
+        elif token in TOGGLE_TOKENS:
+            tag = TOGGLE_TOKENS[token]
+            if tag in out.stack:
+                out.end_tag(tag)
+            else:
+                out.start_tag(tag)
+        elif token in BRACKET_TOKENS:
+            end_token, writer = BRACKET_TOKENS[token]
+            content = []
+            for token in tokens:
+                if token[0] == "~":
+                    content.append(token[1:])
+                elif token == end_token:
+                    break
+                else:
+                    content.append(token)
+            writer(out, "".join(content))
+        elif token == "[[":
+            href = []
+            for token in tokens:
+                if token in ("|", "]]"):
+                    break
+                elif token[0] == "~":
+                    href.append(token[1:])
+                else:
+                    href.append(token)
+            href = "".join(href)
+            out.start_tag("a", {"href": href})
+            if token != "|":
+                out.write_text(href)
+                out.end_tag("a")
+        elif token == "]]":
+            try:
+                out.end_tag("a")
+            except ValueError:
+                out.write_text(token)
+        else:
+            out.write_text(token, post_process=True)
+    out.close()
+    return out.html
+
+
+def span_html(source):
+    return Text(source).html
+
+
+RENDERERS = (
+    ("tokens", token_html),
+    ("spans", span_html),
+)
+
+
+def peak(function, source):
+    tracemalloc.start()
+    try:
+        function(source)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak_bytes
+
+
+def main():
+    print("{0:<8} {1:>9} {2:<7} {3:>12} {4:>10} {5:>14}".format(
+        "text", "bytes", "render", "peak bytes", "seconds", "peak/byte"))
+    for name, fragment in sorted(FRAGMENTS.items()):
+        for size in SIZES:
+            source = fragment * (size // len(fragment) + 1)
+            assert token_html(source) == span_html(source)
+            for renderer, function in RENDERERS:
+                seconds = min(Timer(lambda: function(source)).repeat(3, 1))
+                peak_bytes = peak(function, source)
+                print("{0:<8} {1:>9} {2:<7} {3:>12} {4:>10.4f} {5:>14.2f}".format(
+                    name, len(source), renderer, peak_bytes, seconds, peak_bytes / len(source)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Time inline rendering of paragraphs with heavy markup at increasing
+lengths. With linear token consumption the time per token stays flat as
+the paragraph grows.
+
+    python -m benchmarks.inline_scaling
+"""
+
+from timeit import Timer
+
+from syntaq import Text
+
+
+SIZES = (1000, 2000, 4000, 8000, 16000, 32000)
+FRAGMENT = "**bold** plain //italic// text "
+
+
+def paragraph(size):
+    return FRAGMENT * (size // 4)
+
+
+def main():
+    print("{0:>8} {1:>10} {2:>12}".format("tokens", "seconds", "us/token"))
+    for size in SIZES:
+        text = Text(paragraph(size))
+        count = len(text.tokens)
+        seconds = min(Timer(lambda: text.html).repeat(3, 1))
+        print("{0:>8} {1:>10.4f} {2:>12.3f}".format(count, seconds, 1000000 * seconds / count))
+
+
+if __name__ == "__main__":
+    main()
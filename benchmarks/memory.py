@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Measure the memory retained by a parsed document, comparing the slotted
+node classes with equivalent classes that keep a per-instance __dict__.
+
+    python -m benchmarks.memory
+    python -m benchmarks.memory --size 5000000 --mix tables=1,code=1
+"""
+
+import gc
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from contextlib import contextmanager
+
+import syntaq
+from syntaq import Parser
+
+from benchmarks.corpus import DEFAULT_MIX, generate
+
+
+NODE_CLASSES = ("Text", "Heading", "HorizontalRule", "ListItem", "Literal", "Quote", "TableRow", "Block")
+
+
+def unslotted(cls):
+    namespace = {key: value for key, value in vars(cls).items()
+                 if key not in cls.__slots__ and key not in ("__slots__", "__dict__", "__weakref__")}
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+@contextmanager
+def without_slots():
+    originals = {name: getattr(syntaq, name) for name in NODE_CLASSES}
+    line_types = dict(syntaq.LINE_TYPES)
+    for name, cls in originals.items():
+        setattr(syntaq, name, unslotted(cls))
+    syntaq.LINE_TYPES.update((name, getattr(syntaq, name)) for name in line_types)
+    try:
+        yield
+    finally:
+        for name, cls in originals.items():
+            setattr(syntaq, name, cls)
+        syntaq.LINE_TYPES.update(line_types)
+
+
+def retained(source):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        parser = Parser()
+        parser.parse(source)
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    lines = sum(len(block.lines) for block in parser.blocks)
+    return len(parser.blocks), lines, after - before, peak - before
+
+
+def run(source):
+    results = []
+    with without_slots():
+        results.append(("__dict__",) + retained(source))
+    results.append(("__slots__",) + retained(source))
+    return results
+
+
+def report(size, results, out=sys.stdout):
+    out.write("{0} bytes of source\n".format(size))
+    out.write("{0:<10} {1:>8} {2:>8} {3:>14} {4:>14} {5:>12}\n".format(
+        "nodes", "blocks", "lines", "retained", "peak", "per block"))
+    for name, blocks, lines, retained_bytes, peak in results:
+        out.write("{0:<10} {1:>8} {2:>8} {3:>14} {4:>14} {5:>12.1f}\n".format(
+            name, blocks, lines, retained_bytes, peak, retained_bytes / blocks))
+
+
+def main(argv=None):
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=1000000, help="synthetic document size in bytes")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="feature weights, e.g. prose=4,tables=1")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    source = generate(args.size, args.mix, args.seed)
+    report(len(source.encode("utf-8")), run(source))
+
+
+if __name__ == "__main__":
+    main()
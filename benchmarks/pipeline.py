@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Time each stage of the Syntaq pipeline separately over synthetic and
+bundled documents, reporting throughput and memory use.
+
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --size 1000000 --mix prose=1,tables=1 --json results.json
+
+Stages:
+
+    lex     TEXT_LEXER.tokens over the whole source
+    parse   Parser.parse
+    render  Document.html for an already parsed document
+    route   the bottle content route, with page caching disabled
+
+Highlight and page caches are emptied before every run so that each
+timing reflects the full cost of the stage.
+"""
+
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from shutil import rmtree
+from tempfile import mkdtemp
+from timeit import default_timer
+from wsgiref.util import setup_testing_defaults
+
+from bottle import default_app
+
+import syntaq
+from syntaq import Document, PageCache, Parser, TEXT_LEXER
+
+from benchmarks.corpus import DEFAULT_MIX, bundled, generate
+
+
+def lex(source):
+    return lambda: list(TEXT_LEXER.tokens(source))
+
+
+def parse(source):
+    return lambda: Parser().parse(source)
+
+
+def render(source):
+    document = Document()
+    document.parse(source)
+    return lambda: document.html
+
+
+def route(source):
+    directory = mkdtemp()
+    with open(os.path.join(directory, "bench.syntaq"), "w") as f:
+        f.write(source)
+    app = default_app()
+
+    def get():
+        content_dir, page_cache = syntaq.CONTENT_DIR, syntaq.PAGE_CACHE
+        syntaq.CONTENT_DIR, syntaq.PAGE_CACHE = directory, PageCache(max_bytes=0)
+        try:
+            environ = {}
+            setup_testing_defaults(environ)
+            environ["PATH_INFO"] = "/bench"
+            return b"".join(app(environ, lambda status, headers, exc_info=None: None))
+        finally:
+            syntaq.CONTENT_DIR, syntaq.PAGE_CACHE = content_dir, page_cache
+
+    get.cleanup = lambda: rmtree(directory)
+    return get
+
+
+STAGES = [
+    ("lex", lex),
+    ("parse", parse),
+    ("render", render),
+    ("route", route),
+]
+
+
+def reset_caches():
+    syntaq.HIGHLIGHT_CACHE.clear()
+    syntaq.PYGMENTS_LEXERS.clear()
+
+
+def measure(function, repeat):
+    best = None
+    for _ in range(repeat):
+        reset_caches()
+        start = default_timer()
+        function()
+        elapsed = default_timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    reset_caches()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        function()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak - before, after - before
+
+
+def run(corpora, stages, repeat):
+    results = []
+    for name, source in corpora:
+        size = len(source.encode("utf-8"))
+        for stage, factory in STAGES:
+            if stage not in stages:
+                continue
+            function = factory(source)
+            try:
+                seconds, peak, retained = measure(function, repeat)
+            finally:
+                getattr(function, "cleanup", lambda: None)()
+            results.append({
+                "corpus": name,
+                "stage": stage,
+                "bytes": size,
+                "seconds": seconds,
+                "mb_per_s": size / seconds / 1000000 if seconds else None,
+                "peak_bytes": peak,
+                "retained_bytes": retained,
+            })
+    return results
+
+
+def report(results, out=sys.stdout):
+    out.write("{0:<28} {1:<7} {2:>10} {3:>10} {4:>9} {5:>12}\n".format(
+        "corpus", "stage", "bytes", "seconds", "MB/s", "peak bytes"))
+    for result in results:
+        out.write("{corpus:<28} {stage:<7} {bytes:>10} {seconds:>10.4f} {mb_per_s:>9.3f} {peak_bytes:>12}\n".format(
+            **result))
+
+
+def main(argv=None):
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, action="append",
+                        help="synthetic document size in bytes (repeatable, default 100000)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="feature weights, e.g. prose=4,tables=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage; the best is reported")
+    parser.add_argument("--stage", action="append", choices=[stage for stage, _ in STAGES],
+                        help="stage to run (repeatable, default all)")
+    parser.add_argument("--no-bundled", action="store_true", help="skip the bundled content/*.syntaq files")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    args = parser.parse_args(argv)
+
+    corpora = []
+    for size in args.size or [100000]:
+        corpora.append(("synthetic-%d" % size, generate(size, args.mix, args.seed)))
+    if not args.no_bundled:
+        corpora.extend(bundled())
+    results = run(corpora, args.stage or [stage for stage, _ in STAGES], args.repeat)
+    report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "syntaq": syntaq.__version__,
+                "mix": args.mix,
+                "seed": args.seed,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
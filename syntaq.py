@@ -16,11 +16,28 @@
 # limitations under the License.
 
 
+import gzip
+import marshal
+import mmap
+import os
 import re
 import string
-
-from bottle import abort, get, response, run, static_file, template
-from pygments import highlight
+from argparse import ArgumentParser
+from codecs import getincrementaldecoder
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from hashlib import sha1
+from heapq import heapify, heappop, heappush
+from io import IncrementalNewlineDecoder
+from itertools import islice, repeat
+from tempfile import NamedTemporaryFile
+from threading import Lock, local
+from timeit import default_timer
+
+from bottle import (HTTPResponse, SimpleTemplate, abort, get, http_date, parse_date, request, response, run,
+                    static_file)
+from pygments import __version__ as pygments_version, highlight
 from pygments.lexers import get_lexer_by_name
 from pygments.formatters.html import HtmlFormatter
 from pygments.util import ClassNotFound
@@ -31,20 +48,222 @@ __license__ = "Apache License, Version 2.0"
 __version__ = "v2"
 
 
+class Stats(object):
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self.lock = Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    @contextmanager
+    def timer(self, stage):
+        start = default_timer()
+        try:
+            yield
+        finally:
+            self.add(stage, default_timer() - start)
+
+    def clear(self):
+        with self.lock:
+            self.seconds.clear()
+            self.calls.clear()
+
+    def as_dict(self):
+        with self.lock:
+            return {stage: {"calls": self.calls[stage], "seconds": self.seconds[stage]}
+                    for stage in sorted(self.seconds)}
+
+
+class LimitExceeded(ValueError):
+
+    pass
+
+
+class Limits(object):
+
+    def __init__(self, max_input_bytes=None, max_inline_tokens=None, max_nesting=None, max_cells=None,
+                 time_budget=None):
+        self.max_input_bytes = max_input_bytes
+        self.max_inline_tokens = max_inline_tokens
+        self.max_nesting = max_nesting
+        self.max_cells = max_cells
+        self.time_budget = time_budget
+
+    def deadline(self):
+        if self.time_budget is None:
+            return None
+        return default_timer() + self.time_budget
+
+    @staticmethod
+    def check_deadline(deadline):
+        if deadline is not None and default_timer() > deadline:
+            raise LimitExceeded("Time budget exceeded")
+
+
+_compiling = local()
+
+
+def active_stats():
+    return getattr(_compiling, "stats", None)
+
+
+def active_limits():
+    return getattr(_compiling, "limits", None)
+
+
+@contextmanager
+def compiling(stats=None, limits=None):
+    if stats is None and limits is None:
+        yield
+        return
+    previous = active_stats(), active_limits()
+    _compiling.stats = stats or previous[0]
+    _compiling.limits = limits or previous[1]
+    try:
+        yield
+    finally:
+        _compiling.stats, _compiling.limits = previous
+
+
+def block_type_name(content_type):
+    return content_type.__name__ if content_type else "paragraph"
+
+
 URI_PATTERN = re.compile(r"""(?i)\b((?:[a-z][\w-]+:(?:/{1,3}|[a-z0-9%])|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'".,<>?«»“”‘’]))""")
 
 
+URI_SCHEME_RUN = re.compile(r"(?<![\w-])[\w-]+:")
+URI_SCHEME_START = re.compile(r"(?i)[a-z]")
+URI_SCHEME_CHAR = re.compile(r"(?i)[a-z0-9%]")
+URI_WWW = re.compile(r"(?i)\bwww\d{0,3}[.]")
+URI_DOMAIN_RUN = re.compile(r"(?i)(?<![a-z0-9.\-])[a-z0-9.\-]+/")
+URI_DOMAIN_TAIL = re.compile(r"(?i)[.][a-z]{2,4}")
+URI_RUN = re.compile(r"[^\s()<>]*")
+URI_GROUP = re.compile(r"\((?:[^\s()<>]|\([^\s()<>]+\))*\)")
+URI_UNENDING = "`!{};:'\".,?\u00ab\u00bb\u201c\u201d\u2018\u2019[]"
+
+
+def is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+def at_word_boundary(text, p):
+    return (p > 0 and is_word_char(text[p - 1])) != (p < len(text) and is_word_char(text[p]))
+
+
+def uri_body_end(text, p):
+    # A URI body is a sequence of characters and balanced parenthesised
+    # groups, and ends at the last group or non-punctuation character that
+    # is not its first element. Each element is inspected exactly once.
+    end = None
+    first = True
+    while p < len(text):
+        if text[p] == "(":
+            match = URI_GROUP.match(text, p)
+            if match is None:
+                break
+            p = match.end()
+            if not first:
+                end = p
+        else:
+            q = URI_RUN.match(text, p).end()
+            if q == p:
+                break
+            r = p + len(text[p:q].rstrip(URI_UNENDING))
+            if r > p + first:
+                end = r
+            p = q
+        first = False
+    return end
+
+
+def uri_candidates(text):
+    # Every URI prefix ends at a scheme colon, after "www." or at the slash
+    # following a domain name. All starts within the same run of scheme or
+    # domain characters share a prefix end, and so share a match end.
+    for match in URI_SCHEME_RUN.finditer(text):
+        start, colon = match.start(), match.end() - 1
+        prefix_ends = []
+        slashes = 0
+        while slashes < 3 and text.startswith("/", colon + 1 + slashes):
+            slashes += 1
+        for n in range(slashes, 0, -1):
+            prefix_ends.append(colon + 1 + n)
+        if URI_SCHEME_CHAR.match(text, colon + 1):
+            prefix_ends.append(colon + 2)
+        yield start, colon - 2, 0, prefix_ends
+    for match in URI_WWW.finditer(text):
+        yield match.start(), match.start(), 1, [match.end()]
+    for match in URI_DOMAIN_RUN.finditer(text):
+        start, slash = match.start(), match.end() - 1
+        dot = text.rfind(".", start, slash)
+        if dot > start and URI_DOMAIN_TAIL.fullmatch(text, dot, slash):
+            yield start, dot - 1, 2, [slash + 1]
+
+
+def uri_start(text, rank, p, last):
+    while p <= last:
+        if at_word_boundary(text, p) and (rank != 0 or URI_SCHEME_START.match(text, p)):
+            return p
+        p += 1
+    return None
+
+
+def uri_spans(text):
+    candidates = list(uri_candidates(text))
+    heap = []
+    for i, (first, last, rank, _) in enumerate(candidates):
+        start = uri_start(text, rank, first, last)
+        if start is not None:
+            heap.append((start, rank, i))
+    heapify(heap)
+    body_ends = {}
+    spans = []
+    p = 0
+    while heap:
+        start, rank, i = heappop(heap)
+        _, last, _, prefix_ends = candidates[i]
+        if start >= p:
+            for prefix_end in prefix_ends:
+                if prefix_end not in body_ends:
+                    body_ends[prefix_end] = uri_body_end(text, prefix_end)
+                end = body_ends[prefix_end]
+                if end is not None:
+                    break
+            else:
+                continue
+            spans.append((start, end))
+            p = end
+        start = uri_start(text, rank, max(start + 1, p), last)
+        if start is not None:
+            heappush(heap, (start, rank, i))
+    return spans
+
+
 def auto_link(text):
+    stats = active_stats()
+    if stats is not None:
+        with stats.timer("auto_link"):
+            return _auto_link(text)
+    return _auto_link(text)
+
+
+def _auto_link(text):
+    if ":" not in text and "/" not in text and ("." not in text or "www" not in text.lower()):
+        return HTML.entities(text)
     out = HTML()
-    bits = URI_PATTERN.split(text)
-    out.write_text(bits[0])
-    p = 1
-    while p < len(bits):
-        url = bits[p]
+    p = 0
+    for start, end in uri_spans(text):
+        out.write_text(text[p:start])
+        url = text[start:end]
         out.element("a", {"href": url}, text=url)
-        p += 5
-        out.write_text(bits[p])
-        p += 1
+        p = end
+    out.write_text(text[p:])
     return out.html
 
 
@@ -65,19 +284,11 @@ class HTML(object):
 
     @staticmethod
     def entities(text):
-        chars = list(text)
-        for i, ch in enumerate(chars):
-            if ch == "&":
-                chars[i] = "&amp;"
-            elif ch == "'":
-                chars[i] = "&apos;"
-            elif ch == "\"":
-                chars[i] = "&quot;"
-            elif ch == "<":
-                chars[i] = "&lt;"
-            elif ch == ">":
-                chars[i] = "&gt;"
-        return "".join(chars)
+        return (text.replace("&", "&amp;")
+                    .replace("'", "&apos;")
+                    .replace("\"", "&quot;")
+                    .replace("<", "&lt;")
+                    .replace(">", "&gt;"))
 
     def __init__(self, processor=None):
         self.tokens = []
@@ -104,14 +315,14 @@ class HTML(object):
 
     def write_text(self, text, post_process=False):
         if post_process:
-            self.token_buffer.extend(text)
+            self.token_buffer.append(text)
         else:
             self._flush()
-            self.tokens.extend(HTML.entities(text))
+            self.tokens.append(HTML.entities(text))
 
     def write_raw(self, text):
         self._flush()
-        self.tokens.extend(text)
+        self.tokens.append(text)
 
     def tag(self, tag, attributes=None):
         if attributes:
@@ -166,13 +377,94 @@ class HTML(object):
 
 class Lexer(object):
 
-    def __init__(self, escape, *markers):
+    patterns = {}
+    registry = {}
+
+    @classmethod
+    def shared(cls, escape, *markers):
+        key = (escape, markers)
+        try:
+            return cls.registry[key]
+        except KeyError:
+            lexer = cls.registry[key] = cls(escape, *markers)
+            return lexer
+
+    @classmethod
+    def pattern(cls, escape, markers):
+        key = (escape, tuple(markers))
+        try:
+            return cls.patterns[key]
+        except KeyError:
+            alternation = "|".join(map(re.escape, markers))
+            groups = "|".join("({0})".format(re.escape(marker)) for marker in markers)
+            if len(escape) == 1:
+                pattern = "{0}(?:{1}|{2})|(?!{0})(?:{3})".format(
+                    re.escape(escape), re.escape(escape), alternation, groups)
+            else:
+                pattern = "{0}|{1}".format(re.escape(escape), groups)
+            compiled = cls.patterns[key] = re.compile(pattern)
+            return compiled
+
+    def __init__(self, escape, *markers, compiled=True):
         self.escape = escape
-        self.markers = [self.escape]
-        self.markers.extend(markers)
-        self.marker_chars = set(marker[0] for marker in self.markers)
+        self.markers = (self.escape,) + markers
+        self.marker_chars = frozenset(marker[0] for marker in self.markers)
+        self.group_markers = (None,) + markers
+        if compiled:
+            self.regex = Lexer.pattern(escape, markers)
+        else:
+            self.regex = None
 
     def tokens(self, source):
+        if self.regex is None:
+            return self.scan(source)
+        else:
+            return self.match(source)
+
+    def match(self, source):
+        p = 0
+        for match in self.regex.finditer(source):
+            q, end = match.span()
+            if q > p:
+                yield source[p:q]
+            yield source[q:end]
+            p = end
+        if len(source) > p:
+            yield source[p:]
+
+    def spans(self, source):
+        if self.regex is None:
+            return self.scan_spans(source)
+        else:
+            return self.match_spans(source)
+
+    def match_spans(self, source):
+        escape, markers = self.escape, self.group_markers
+        p = 0
+        for match in self.regex.finditer(source):
+            q, end = match.span()
+            if q > p:
+                yield p, q, None
+            index = match.lastindex
+            yield q, end, escape if index is None else markers[index]
+            p = end
+        if len(source) > p:
+            yield p, len(source), None
+
+    def scan_spans(self, source):
+        escape, markers = self.escape, self.markers[1:]
+        p = 0
+        for token in self.scan(source):
+            q = p + len(token)
+            if token in markers:
+                yield p, q, token
+            elif escape and token.startswith(escape) and token[len(escape):] in self.markers:
+                yield p, q, escape
+            else:
+                yield p, q, None
+            p = q
+
+    def scan(self, source):
         p, q = 0, 0
         while q < len(source):
             if source[q] in self.marker_chars:
@@ -198,72 +490,112 @@ class Lexer(object):
 
 class Text(object):
 
+    __slots__ = ("source", "lexed")
+
     def __init__(self, source=None):
         self.source = source
-        partitioner = Lexer("~",
-            "http://", "https://", "ftp://", "mailto:", "<<", ">>",
-                            Quote.BLOCK_DELIMITER, "<--", "-->",
-            "\\\\", "{{", "}}", Literal.INLINE_DELIMITER, Quote.INLINE_DELIMITER,
-            "**", "//", "^^", "__", "[[", "]]", "|"
-                            )
-        self.tokens = list(partitioner.tokens(source))
+        self.lexed = None
+
+    def lex(self, limit=None):
+        stats = active_stats()
+        if stats is None:
+            return list(islice(TEXT_LEXER.spans(self.source), limit))
+        with stats.timer("lex"):
+            return list(islice(TEXT_LEXER.spans(self.source), limit))
+
+    @property
+    def spans(self):
+        if self.lexed is None:
+            self.lexed = self.lex()
+        return self.lexed
+
+    @property
+    def tokens(self):
+        source = self.source
+        return [source[start:end] for start, end, _ in self.spans]
+
+    def to_ir(self):
+        return self.source, self.spans
+
+    @classmethod
+    def from_ir(cls, ir):
+        text = cls.__new__(cls)
+        text.source, text.lexed = ir
+        return text
 
     @property
     def html(self):
+        limits = active_limits()
+        max_depth = max_tokens = None
+        if limits is not None:
+            max_depth, max_tokens = limits.max_nesting, limits.max_inline_tokens
+        source = self.source
+        spans = self.lexed
+        if spans is None:
+            if max_tokens is None and active_stats() is None:
+                spans = TEXT_LEXER.spans(source)
+            else:
+                spans = self.lex(None if max_tokens is None else max_tokens + 1)
+        if max_tokens is not None and len(spans) > max_tokens:
+            return HTML.entities(source)
+        spans = iter(spans)
         out = HTML(processor=auto_link)
-        tokens = self.tokens[:]
-        while tokens:
-            token = tokens.pop(0)
-            if token[0] == "~":
-                out.write_text(token[1:])
-            elif token in SIMPLE_TOKENS:
-                out.write_html(SIMPLE_TOKENS[token])
-            elif token in TOGGLE_TOKENS:
-                tag = TOGGLE_TOKENS[token]
+        for start, end, marker in spans:
+            if source[start] == "~":
+                out.write_text(source[start + 1:end])
+            elif marker in SIMPLE_TOKENS:
+                out.write_html(SIMPLE_TOKENS[marker])
+            elif marker in TOGGLE_TOKENS:
+                tag = TOGGLE_TOKENS[marker]
                 if tag in out.stack:
                     out.end_tag(tag)
+                elif max_depth is not None and len(out.stack) >= max_depth:
+                    out.write_text(marker)
                 else:
                     out.start_tag(tag)
-            elif token in BRACKET_TOKENS:
-                end_token, writer = BRACKET_TOKENS[token]
-                source = []
-                while tokens:
-                    token = tokens.pop(0)
-                    if token[0] == "~":
-                        source.append(token[1:])
-                    elif token == end_token:
-                        break
-                    else:
-                        source.append(token)
-                writer(out, "".join(source))
-            elif token == "[[":
-                href = []
-                while tokens:
-                    token = tokens.pop(0)
-                    if token in ("|", "]]"):
-                        break
-                    elif token[0] == "~":
-                        href.append(token[1:])
-                    else:
-                        href.append(token)
-                href = "".join(href)
+            elif marker in BRACKET_TOKENS:
+                end_token, writer = BRACKET_TOKENS[marker]
+                writer(out, Text.collect(source, spans, end, (end_token,))[0])
+            elif marker == "[[":
+                href, marker = Text.collect(source, spans, end, ("|", "]]"))
+                if max_depth is not None and len(out.stack) >= max_depth:
+                    out.write_text(href)
+                    continue
                 out.start_tag("a", {"href": href})
-                if token != "|":
+                if marker != "|":
                     out.write_text(href)
                     out.end_tag("a")
-            elif token == "]]":
+            elif marker == "]]":
                 try:
                     out.end_tag("a")
                 except ValueError:
-                    out.write_text(token)
+                    out.write_text(marker)
             else:
-                out.write_text(token, post_process=True)
+                out.write_text(source[start:end], post_process=True)
         out.close()
         return out.html
 
+    @staticmethod
+    def collect(source, spans, start, stops):
+        pieces = []
+        for p, q, marker in spans:
+            if marker in stops:
+                break
+            elif source[p] == "~":
+                pieces.append(source[start:p])
+                start = p + 1
+        else:
+            p, marker = len(source), None
+        if pieces:
+            pieces.append(source[start:p])
+            return "".join(pieces), marker
+        return source[start:p], marker
+
 
 class Heading(object):
 
+    __slots__ = ("source", "level", "text", "id")
+
     @classmethod
     def check(cls, source):
         return source.startswith("=")
@@ -271,6 +603,7 @@ class Heading(object):
     def __init__(self, source):
         if not Heading.check(source):
             raise ValueError("Heading must start with '='")
+        self.source = source
         chars = list(source)
         self.level = 0
         while chars and chars[0] == "=":
@@ -279,6 +612,23 @@ class Heading(object):
         self.text = Text("".join(chars).strip().rstrip("=").rstrip())
         if self.level > 6:
             self.level = 6
+        self.id = None
+
+    @property
+    def anchor(self):
+        if self.id is None:
+            return slug(self.text.source)
+        return self.id
+
+    def to_ir(self):
+        return self.source, self.level, self.id, self.text.to_ir()
+
+    @classmethod
+    def from_ir(cls, ir):
+        heading = cls.__new__(cls)
+        heading.source, heading.level, heading.id, text = ir
+        heading.text = Text.from_ir(text)
+        return heading
 
     @property
     def html(self):
@@ -286,15 +636,10 @@ class Heading(object):
         if self.level == 1:
             out.element("h1", html=self.text.html)
         else:
-            heading_text = self.text
-            heading_id = "".join(ch if ch in "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz" else "-"
-                                 for ch in heading_text.source)
-            heading_id = heading_id.strip("-").lower()
-            while "--" in heading_id:
-                heading_id = heading_id.replace("--", "-")
+            heading_id = self.anchor
             tag = "h%d" % self.level
             out.start_tag(tag, {"id": heading_id})
-            out.write_html(heading_text.html)
+            out.write_html(self.text.html)
             out.element("a", {"href": "#%s" % heading_id}, raw="&sect;")
             out.end_tag(tag)
         return out.html
@@ -302,6 +647,8 @@ class Heading(object):
 
 class HorizontalRule(object):
 
+    __slots__ = ("source",)
+
     @classmethod
     def check(cls, source):
         return source.startswith("----")
@@ -309,6 +656,16 @@ class HorizontalRule(object):
     def __init__(self, source):
         if not HorizontalRule.check(source):
             raise ValueError("Horizontal rule must start with '----'")
+        self.source = source
+
+    def to_ir(self):
+        return self.source
+
+    @classmethod
+    def from_ir(cls, ir):
+        rule = cls.__new__(cls)
+        rule.source = ir
+        return rule
 
     @property
     def html(self):
@@ -319,6 +676,8 @@ class HorizontalRule(object):
 
 class ListItem(object):
 
+    __slots__ = ("source", "signature", "level", "item")
+
     @classmethod
     def check(cls, source, content_type):
         if content_type is ListItem or not source.startswith("**"):
@@ -327,6 +686,7 @@ class ListItem(object):
             return False
 
     def __init__(self, source):
+        self.source = source
         chars = list(source)
         signature = []
         while chars and chars[0] in "#*":
@@ -335,6 +695,18 @@ class ListItem(object):
         self.level = len(signature)
         self.item = Text("".join(chars).strip())
 
+    def to_ir(self):
+        return self.source, "".join(self.signature), self.item.to_ir()
+
+    @classmethod
+    def from_ir(cls, ir):
+        item = cls.__new__(cls)
+        item.source, signature, text = ir
+        item.signature = tuple(signature)
+        item.level = len(signature)
+        item.item = Text.from_ir(text)
+        return item
+
     def ordered(self, level):
         return self.signature[level] == "#"
 
@@ -354,12 +726,25 @@ class ListItem(object):
 
 class Literal(object):
 
+    __slots__ = ("line",)
+
     INLINE_DELIMITER = "``"
     BLOCK_DELIMITER = "```"
 
     def __init__(self, source):
         self.line = source
 
+    @property
+    def source(self):
+        return self.line
+
+    def to_ir(self):
+        return self.line
+
+    @classmethod
+    def from_ir(cls, ir):
+        return cls(ir)
+
     @property
     def html(self):
         out = HTML()
@@ -371,12 +756,27 @@ class Literal(object):
 
 class Quote(object):
 
+    __slots__ = ("text",)
+
     INLINE_DELIMITER = '""'
     BLOCK_DELIMITER = '"""'
 
     def __init__(self, source):
         self.text = Text(source)
 
+    @property
+    def source(self):
+        return self.text.source
+
+    def to_ir(self):
+        return self.text.to_ir()
+
+    @classmethod
+    def from_ir(cls, ir):
+        quote = cls.__new__(cls)
+        quote.text = Text.from_ir(ir)
+        return quote
+
     @property
     def html(self):
         return self.text.html
@@ -384,39 +784,55 @@ class Quote(object):
 
 class TableRow(object):
 
+    __slots__ = ("source", "cells", "layout")
+
     def __init__(self, source):
         assert source.startswith("|")
+        self.source = source
         bracket_tokens = {
             Literal.INLINE_DELIMITER: Literal.INLINE_DELIMITER,
             "[[": "]]",
             "{{": "}}",
         }
-        lexer = Lexer("~", "|", Literal.INLINE_DELIMITER, "[[", "]]", "{{", "}}")
         source = source.rstrip()
         if source.endswith("|"):
             source = source[:-1]
-        tokens = list(lexer.tokens(source))
+        spans = TABLE_ROW_LEXER.spans(source)
         cells = []
-        while tokens:
-            token = tokens.pop(0)
-            if token == "|":
-                cells.append([])
-            elif token in bracket_tokens:
-                end = bracket_tokens[token]
-                cells[-1].append(token)
-                while tokens:
-                    token = tokens.pop(0)
-                    cells[-1].append(token)
-                    if token == end:
+        start = None
+        for p, q, marker in spans:
+            if marker == "|":
+                if start is not None:
+                    cells.append(source[start:p])
+                start = q
+            elif marker in bracket_tokens:
+                end = bracket_tokens[marker]
+                for p, q, marker in spans:
+                    if marker == end:
                         break
-            else:
-                cells[-1].append(token)
-        self.cells = ["".join(cell) for cell in cells]
+        if start is not None:
+            cells.append(source[start:])
+        self.cells = cells
+        self.layout = None
+
+    def to_ir(self):
+        columns = [(tag, attributes, text.to_ir()) for tag, attributes, text in self.columns]
+        return self.source, self.cells, columns
+
+    @classmethod
+    def from_ir(cls, ir):
+        row = cls.__new__(cls)
+        row.source, row.cells, columns = ir
+        row.layout = [(tag, attributes, Text.from_ir(text)) for tag, attributes, text in columns]
+        return row
 
     @property
-    def html(self):
-        out = HTML()
-        out.start_tag("tr")
+    def columns(self):
+        if self.layout is None:
+            self.layout = list(self.iter_columns())
+        return self.layout
+
+    def iter_columns(self):
         for cell in self.cells:
             stripped_cell = cell.strip()
             attributes = {}
@@ -443,17 +859,47 @@ class TableRow(object):
             if align:
                 content = content.strip()
                 attributes["style"] = "text-align:%s" % align
-            out.element(tag, attributes, html=Text(content).html)
+            yield tag, attributes, Text(content)
+
+    @property
+    def html(self):
+        out = HTML()
+        out.start_tag("tr")
+        for tag, attributes, text in self.columns:
+            out.element(tag, attributes, html=text.html)
         out.end_tag("tr")
         return out.html
 
 
+class PlainText(object):
+
+    __slots__ = ("source",)
+
+    def __init__(self, source):
+        self.source = source
+
+    def to_ir(self):
+        return self.source
+
+    @classmethod
+    def from_ir(cls, ir):
+        return cls(ir)
+
+    @property
+    def html(self):
+        return HTML.entities(self.source)
+
+
 class Block(object):
 
+    __slots__ = ("content_type", "metadata", "lines", "digest", "paragraph")
+
     def __init__(self, content_type=None, metadata=None, lines=None):
         self.content_type = content_type
         self.metadata = metadata
         self.lines = []
+        self.digest = None
+        self.paragraph = None
         if lines:
             for line in lines:
                 self.append(line)
@@ -464,6 +910,43 @@ class Block(object):
     def __nonzero__(self):
         return bool(self.lines)
 
+    @property
+    def text(self):
+        if self.paragraph is None:
+            self.paragraph = Text(" ".join(self.lines))
+        return self.paragraph
+
+    @property
+    def fingerprint(self):
+        if self.digest is None:
+            content_type = self.content_type.__name__ if self.content_type else ""
+            key = [content_type, self.metadata or ""]
+            key.extend(line if isinstance(line, str) else line.source for line in self.lines)
+            if self.content_type is Heading:
+                key.extend(line.anchor for line in self.lines)
+            self.digest = sha1("\x00".join(key).encode("utf-8")).hexdigest()
+        return self.digest
+
+    def to_ir(self):
+        if self.content_type is None:
+            return None, self.metadata, self.fingerprint, list(self.lines), self.text.to_ir()
+        else:
+            lines = [line.to_ir() for line in self.lines]
+            return self.content_type.__name__, self.metadata, self.fingerprint, lines, None
+
+    @classmethod
+    def from_ir(cls, ir):
+        content_type, metadata, fingerprint, lines, text = ir
+        block = cls(metadata=metadata)
+        if content_type is None:
+            block.lines = lines
+            block.paragraph = Text.from_ir(text)
+        else:
+            block.content_type = LINE_TYPES[content_type]
+            block.lines = [block.content_type.from_ir(line) for line in lines]
+        block.digest = fingerprint
+        return block
+
     def append(self, line):
         if not self.content_type or isinstance(line, self.content_type):
             self.lines.append(line)
@@ -471,146 +954,476 @@ class Block(object):
             raise ValueError("Cannot add {0} to block of {1}".format(line.__class__.__name__, self.content_type.__name__))
 
 
+LINE_TYPES = {cls.__name__: cls for cls in (Heading, HorizontalRule, ListItem, Literal, Quote, TableRow, PlainText)}
+
+OutlineEntry = namedtuple("OutlineEntry", ["level", "text", "id", "offset"])
+
+
 class Parser(object):
 
-    def __init__(self):
+    LINE_BREAKS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+    def __init__(self, retain=True, stats=None, limits=None):
         self.blocks = []
         self.context = Block()
-        self.title = None
+        self.title_html = None
         self.title_level = 7
+        self.titled = 0
+        self.ids = set()
+        self.outline = []
+        self.count = 0
+        self.retain = retain
+        self.stats = stats
+        self.limits = limits
+        self.pending = []
+        self.size = 0
+        self.cells = 0
+        self.deadline = None
+
+    @property
+    def title(self):
+        with compiling(self.stats, self.limits):
+            for entry in self.outline[self.titled:]:
+                if not self.title_html or entry.level < self.title_level:
+                    self.title_html, self.title_level = entry.text.html, entry.level
+        self.titled = len(self.outline)
+        return self.title_html
+
+    def append(self, block):
+        if block:
+            self.blocks.append(block)
+            self.count += 1
+
+    def emit(self, count):
+        blocks = self.blocks[count:]
+        if not self.retain:
+            del self.blocks[:]
+        return blocks
 
     def parse(self, source):
+        self.feed(source)
+        self.close()
+
+    def parse_file(self, path, encoding="utf-8", chunk_size=1024 * 1024):
+        decoder = IncrementalNewlineDecoder(getincrementaldecoder(encoding)(), translate=True)
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for offset in range(0, len(mm), chunk_size):
+                        self.feed(decoder.decode(mm[offset:offset + chunk_size]))
+        self.feed(decoder.decode(b"", final=True))
+        self.close()
+
+    def feed(self, chunk):
+        count = len(self.blocks)
+        limits = self.limits
+        if limits is not None:
+            if self.deadline is None:
+                self.deadline = limits.deadline()
+            if limits.max_input_bytes is not None:
+                self.size += len(chunk) if chunk.isascii() else len(chunk.encode("utf-8"))
+                if self.size > limits.max_input_bytes:
+                    raise LimitExceeded("Input exceeds %d bytes" % limits.max_input_bytes)
+        lines = chunk.splitlines(True)
+        if not lines:
+            return self.emit(count)
+        pending = self.pending
+        if pending:
+            if pending[-1][-1] == "\r":
+                if lines[0] == "\n":
+                    pending.append(lines[0])
+                    lines[0] = "".join(pending)
+                else:
+                    lines.insert(0, "".join(pending))
+            elif lines[0][-1] in self.LINE_BREAKS:
+                pending.append(lines[0])
+                lines[0] = "".join(pending)
+            else:
+                pending.append(lines[0])
+                return self.emit(count)
+            self.pending = []
+        last_char = lines[-1][-1]
+        if last_char not in self.LINE_BREAKS or last_char == "\r":
+            self.pending = [lines.pop()]
+        with compiling(self.stats, self.limits):
+            for line in lines:
+                self.parse_line(line)
+        return self.emit(count)
 
-        def append(block):
-            if block:
-                self.blocks.append(block)
+    def close(self):
+        count = len(self.blocks)
+        if self.pending:
+            with compiling(self.stats, self.limits):
+                self.parse_line("".join(self.pending))
+            self.pending = []
+        self.append(self.context)
+        self.context = Block()
+        return self.emit(count)
 
-        def parse_literal(line):
-            if line.startswith(Literal.BLOCK_DELIMITER):
-                append(self.context)
-                self.context = Block()
-            else:
-                self.context.lines.append(Literal(line))
+    def parse_literal(self, line):
+        if line.startswith(Literal.BLOCK_DELIMITER):
+            self.append(self.context)
+            self.context = Block()
+        else:
+            self.context.lines.append(Literal(line))
+        return Literal
 
-        def parse_quote(line):
-            if line.startswith(Quote.BLOCK_DELIMITER):
-                append(self.context)
+    def parse_quote(self, line):
+        if line.startswith(Quote.BLOCK_DELIMITER):
+            self.append(self.context)
+            self.context = Block()
+        else:
+            self.context.lines.append(Quote(line))
+        return Quote
+
+    def parse_line(self, line):
+        if self.deadline is not None:
+            Limits.check_deadline(self.deadline)
+        if self.stats is None:
+            return self.classify(line)
+        start = default_timer()
+        content_type = self.classify(line)
+        self.stats.add("parse." + block_type_name(content_type), default_timer() - start)
+        return content_type
+
+    def classify(self, line):
+        content_type = self.context.content_type
+        if content_type is Literal:
+            return self.parse_literal(line)
+        elif content_type is Quote:
+            return self.parse_quote(line)
+        line = line.rstrip()
+        if not line:
+            return self.parse_paragraph(line)
+        first = line[0]
+        if first in self.BLOCK_STARTS:
+            return self.BLOCK_STARTS[first](self, line)
+        elif first.isspace():
+            stripped_line = line.lstrip()
+            if stripped_line[0] in "#*" and ListItem.check(stripped_line, content_type):
+                return self.parse_list_item(line, stripped_line)
+        return self.parse_paragraph(line)
+
+    def parse_heading(self, line):
+        self.append(self.context)
+        self.context = Block()
+        source = Heading(line)
+        if source.level > 1:
+            source.id = self.unique_id(slug(source.text.source))
+        self.outline.append(OutlineEntry(source.level, source.text, source.id, self.count))
+        self.append(Block(Heading, lines=[source]))
+        return Heading
+
+    def unique_id(self, heading_id):
+        if heading_id:
+            candidate, n = heading_id, 1
+            while candidate in self.ids:
+                n += 1
+                candidate = "%s-%d" % (heading_id, n)
+            heading_id = candidate
+            self.ids.add(heading_id)
+        return heading_id
+
+    def parse_rule(self, line):
+        if not line.startswith("----"):
+            return self.parse_paragraph(line)
+        self.append(self.context)
+        self.context = Block()
+        self.append(Block(HorizontalRule, lines=[HorizontalRule(line)]))
+        return HorizontalRule
+
+    def parse_list_item(self, line, stripped_line=None):
+        stripped_line = stripped_line or line
+        if not ListItem.check(stripped_line, self.context.content_type):
+            return self.parse_paragraph(line)
+        elif not self.within_nesting(stripped_line):
+            return self.parse_plain(line)
+        source = ListItem(stripped_line)
+        if not (self.context and self.context.content_type is ListItem and self.context.lines[0].compatible(source)):
+            self.append(self.context)
+            self.context = Block(ListItem)
+        self.context.lines.append(source)
+        return ListItem
+
+    def parse_literal_start(self, line):
+        if not line.startswith(Literal.BLOCK_DELIMITER):
+            return self.parse_paragraph(line)
+        metadata = line.lstrip("`").strip()
+        self.append(self.context)
+        self.context = Block(Literal, metadata=metadata)
+        return Literal
+
+    def parse_quote_start(self, line):
+        if not line.startswith(Quote.BLOCK_DELIMITER):
+            return self.parse_paragraph(line)
+        metadata = line.lstrip('"').strip()
+        self.append(self.context)
+        self.context = Block(Quote, metadata=metadata)
+        return Quote
+
+    def parse_table_row(self, line):
+        row = TableRow(line)
+        if not self.within_cells(row):
+            return self.parse_plain(line)
+        if self.context.content_type is not TableRow:
+            self.append(self.context)
+            self.context = Block(TableRow)
+        self.context.lines.append(row)
+        return TableRow
+
+    BLOCK_STARTS = {
+        "=": parse_heading,
+        "-": parse_rule,
+        "#": parse_list_item,
+        "*": parse_list_item,
+        "`": parse_literal_start,
+        '"': parse_quote_start,
+        "|": parse_table_row,
+    }
+
+    def parse_paragraph(self, line):
+        if self.context.content_type is not None:
+            self.append(self.context)
+            self.context = Block()
+        if line:
+            self.context.lines.append(line)
+        else:
+            if self.context:
+                self.append(self.context)
                 self.context = Block()
-            else:
-                self.context.lines.append(Quote(line))
+        return None
 
-        for line in source.splitlines(True):
-            if self.context.content_type is Literal:
-                parse_literal(line)
-            elif self.context.content_type is Quote:
-                parse_quote(line)
-            else:
-                line = line.rstrip()
-                stripped_line = line.lstrip()
-                if Heading.check(line):
-                    append(self.context)
-                    self.context = Block()
-                    source = Heading(line)
-                    append(Block(Heading, lines=[source]))
-                    if not self.title or source.level < self.title_level:
-                        self.title, self.title_level = source.text.html, source.level
-                elif line.startswith("----"):
-                    append(self.context)
-                    self.context = Block()
-                    append(Block(HorizontalRule, lines=[HorizontalRule(line)]))
-                elif ListItem.check(stripped_line, self.context.content_type):
-                    source = ListItem(stripped_line)
-                    if not (self.context and self.context.content_type is ListItem and self.context.lines[0].compatible(source)):
-                        append(self.context)
-                        self.context = Block(ListItem)
-                    self.context.lines.append(source)
-                elif line.startswith(Literal.BLOCK_DELIMITER):
-                    metadata = line.lstrip("`").strip()
-                    append(self.context)
-                    self.context = Block(Literal, metadata=metadata)
-                elif line.startswith(Quote.BLOCK_DELIMITER):
-                    metadata = line.lstrip('"').strip()
-                    append(self.context)
-                    self.context = Block(Quote, metadata=metadata)
-                elif line.startswith("|"):
-                    if self.context.content_type is not TableRow:
-                        append(self.context)
-                        self.context = Block(TableRow)
-                    self.context.lines.append(TableRow(line))
-                else:
-                    if self.context.content_type is not None:
-                        append(self.context)
-                        self.context = Block()
-                    if line:
-                        self.context.lines.append(line)
-                    else:
-                        if self.context:
-                            append(self.context)
-                            self.context = Block()
-        append(self.context)
+    def parse_plain(self, line):
+        if self.context.content_type is not PlainText:
+            self.append(self.context)
+            self.context = Block(PlainText)
+        self.context.lines.append(PlainText(line))
+        return PlainText
+
+    def within_nesting(self, line):
+        if self.limits is None or self.limits.max_nesting is None:
+            return True
+        return len(line) - len(line.lstrip("#*")) <= self.limits.max_nesting
+
+    def within_cells(self, row):
+        if self.limits is None or self.limits.max_cells is None:
+            return True
+        self.cells += len(row.cells)
+        return self.cells <= self.limits.max_cells
 
 
 class Document(object):
 
-    def __init__(self):
-        self.parser = Parser()
+    PARALLEL_THRESHOLD = 64
+    IR_VERSION = 5
+
+    def __init__(self, stats=None, limits=None, executor=None, parallel_threshold=PARALLEL_THRESHOLD):
+        self.stats = stats
+        self.limits = limits
+        self.executor = executor
+        self.parallel_threshold = parallel_threshold
+        self.parser = Parser(stats=stats, limits=limits)
+        self.rendered = None
         self.blocks = []
         self.block = Block()
 
     def parse(self, source):
         self.parser.parse(source)
 
+    def parse_file(self, path, encoding="utf-8"):
+        self.parser.parse_file(path, encoding)
+
+    def update(self, source):
+        previous = self.rendered or {}
+        self.parser = Parser(stats=self.stats, limits=self.limits)
+        self.parser.parse(source)
+        rendered = {}
+        changed = []
+        for i, block in enumerate(self.parser.blocks):
+            Limits.check_deadline(self.parser.deadline)
+            fingerprint = block.fingerprint
+            if fingerprint in rendered:
+                continue
+            html = previous.get(fingerprint)
+            if html is None:
+                html = self.compile_block(block)
+                changed.append(i)
+            rendered[fingerprint] = html
+        self.rendered = rendered
+        return changed
+
     @property
     def title(self):
         return self.parser.title
 
     @property
-    def html(self):
+    def toc(self):
+        return self.parser.outline
+
+    @property
+    def toc_html(self):
         out = HTML()
-        for block in self.parser.blocks:
-            if block.content_type is None:
-                out.element("p", html=Text(" ".join(block.lines)).html)
-            elif block.content_type in (Heading, HorizontalRule):
-                for line in block.lines:
-                    out.write_html(line.html)
-            elif block.content_type is Literal:
-                source = "".join(line.line for line in block.lines)
-                lang, _, metadata = block.metadata.partition(" ")
-                try:
-                    lexer = get_lexer_by_name(lang)
-                except ClassNotFound:
-                    lexer = None
-                if lexer is None:
-                    out.start_tag("pre")
-                    out.write_text(source)
-                    out.end_tag("pre")
+        levels = []
+        with compiling(self.stats, self.limits):
+            for entry in self.toc:
+                while levels and entry.level < levels[-1]:
+                    out.end_tag("li")
+                    out.end_tag("ul")
+                    levels.pop()
+                if not levels or entry.level > levels[-1]:
+                    out.start_tag("ul")
+                    levels.append(entry.level)
+                else:
+                    out.end_tag("li")
+                out.start_tag("li")
+                if entry.id:
+                    out.element("a", {"href": "#%s" % entry.id}, html=entry.text.html)
+                else:
+                    out.write_html(entry.text.html)
+        while levels:
+            out.end_tag("li")
+            out.end_tag("ul")
+            levels.pop()
+        return out.html
+
+    def to_ir(self):
+        parser = self.parser
+        return {
+            "version": self.IR_VERSION,
+            "blocks": [block.to_ir() for block in parser.blocks],
+        }
+
+    @classmethod
+    def from_ir(cls, ir, stats=None, limits=None):
+        if ir.get("version") != cls.IR_VERSION:
+            raise ValueError("Unsupported IR version {0!r}".format(ir.get("version")))
+        document = cls(stats=stats, limits=limits)
+        parser = document.parser
+        parser.blocks = [Block.from_ir(block) for block in ir["blocks"]]
+        parser.count = len(parser.blocks)
+        for offset, block in enumerate(parser.blocks):
+            if block.content_type is Heading:
+                heading = block.lines[0]
+                parser.outline.append(OutlineEntry(heading.level, heading.text, heading.id, offset))
+        return document
+
+    def dumps(self):
+        return marshal.dumps(self.to_ir())
+
+    @classmethod
+    def loads(cls, data, stats=None, limits=None):
+        return cls.from_ir(marshal.loads(data), stats=stats, limits=limits)
+
+    @staticmethod
+    def block_html(block):
+        out = HTML()
+        if block.content_type is None:
+            out.element("p", html=block.text.html)
+        elif block.content_type in (Heading, HorizontalRule):
+            for line in block.lines:
+                out.write_html(line.html)
+        elif block.content_type is Literal:
+            source = "".join(line.line for line in block.lines)
+            lang, _, metadata = block.metadata.partition(" ")
+            lexer = pygments_lexer(lang)
+            if lexer is None:
+                out.start_tag("pre")
+                out.write_text(source)
+                out.end_tag("pre")
+            else:
+                stats = active_stats()
+                if stats is None:
+                    out.write_raw(HIGHLIGHT_CACHE.highlight(source, lexer, lang, metadata))
                 else:
-                    out.write_raw(highlight(source, lexer, HtmlFormatter()))
-            elif block.content_type is Quote:
-                out.start_tag("blockquote")
-                for line in block.lines:
-                    out.write_html(line.html)
-                out.end_tag("blockquote")
-            elif block.content_type is ListItem:
-                level = 0
-                for line in block.lines:
-                    while level > line.level:
-                        out.end_tag()
-                        level -= 1
-                    while level < line.level:
-                        out.start_tag(line.list_tag(level))
-                        level += 1
-                    out.write_html(line.html)
-                while level:
+                    with stats.timer("highlight"):
+                        out.write_raw(HIGHLIGHT_CACHE.highlight(source, lexer, lang, metadata))
+        elif block.content_type is Quote:
+            out.start_tag("blockquote")
+            for line in block.lines:
+                out.write_html(line.html)
+            out.end_tag("blockquote")
+        elif block.content_type is ListItem:
+            level = 0
+            for line in block.lines:
+                while level > line.level:
                     out.end_tag()
                     level -= 1
-            elif block.content_type is TableRow:
-                out.start_tag("table")
-                for line in block.lines:
-                    out.write_html(line.html)
-                out.end_tag("table")
+                while level < line.level:
+                    out.start_tag(line.list_tag(level))
+                    level += 1
+                out.write_html(line.html)
+            while level:
+                out.end_tag()
+                level -= 1
+        elif block.content_type is TableRow:
+            out.start_tag("table")
+            for line in block.lines:
+                out.write_html(line.html)
+            out.end_tag("table")
+        elif block.content_type is PlainText:
+            out.element("p", html=" ".join(line.html for line in block.lines))
         return out.html
 
+    def iter_html(self):
+        stats, limits = self.stats, self.limits
+        if limits is not None and self.parser.deadline is None:
+            self.parser.deadline = limits.deadline()
+        deadline = self.parser.deadline
+        blocks = self.parser.blocks
+        if self.executor is not None and self.rendered is None and len(blocks) >= self.parallel_threshold:
+            chunks = self.executor.map(render_block, blocks, repeat(limits),
+                                       chunksize=max(1, len(blocks) // 32))
+            start = default_timer()
+            for html in chunks:
+                Limits.check_deadline(deadline)
+                yield html
+            if stats is not None:
+                stats.add("render.parallel", default_timer() - start)
+            return
+        rendered = self.rendered
+        for block in blocks:
+            Limits.check_deadline(deadline)
+            if rendered is not None:
+                html = rendered.get(block.fingerprint)
+                if html is not None:
+                    yield html
+                    continue
+            yield self.compile_block(block)
+
+    def compile_block(self, block):
+        stats, limits = self.stats, self.limits
+        if stats is None and limits is None:
+            return self.block_html(block)
+        elif stats is None:
+            with compiling(limits=limits):
+                return self.block_html(block)
+        else:
+            with compiling(stats, limits), stats.timer("render." + block_type_name(block.content_type)):
+                return self.block_html(block)
+
+    def render(self, fp):
+        for chunk in self.iter_html():
+            fp.write(chunk)
+
+    @property
+    def html(self):
+        return "".join(self.iter_html())
+
+
+def render_block(block, limits=None):
+    with compiling(limits=limits):
+        return Document.block_html(block)
+
+
+TEXT_LEXER = Lexer.shared("~",
+    "http://", "https://", "ftp://", "mailto:", "<<", ">>",
+    Quote.BLOCK_DELIMITER, "<--", "-->",
+    "\\\\", "{{", "}}", Literal.INLINE_DELIMITER, Quote.INLINE_DELIMITER,
+    "**", "//", "^^", "__", "[[", "]]", "|",
+)
+TABLE_ROW_LEXER = Lexer.shared("~",
+    "|", Literal.INLINE_DELIMITER, "[[", "]]", "{{", "}}",
+)
 
 SIMPLE_TOKENS = {
     "\\\\": "<br>",
@@ -631,22 +1444,406 @@ BRACKET_TOKENS = {
 }
 
 
+class LRUCache(object):
+
+    def __init__(self, max_size, weigher=None):
+        self.max_size = max_size
+        self.weigher = weigher or (lambda value: 1)
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value, _ = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+    def put(self, key, value):
+        weight = self.weigher(value)
+        with self.lock:
+            self._discard(key)
+            if weight > self.max_size:
+                return
+            self.entries[key] = (value, weight)
+            self.size += weight
+            while self.size > self.max_size:
+                _, (_, evicted_weight) = self.entries.popitem(last=False)
+                self.size -= evicted_weight
+
+    def discard(self, key):
+        with self.lock:
+            self._discard(key)
+
+    def _discard(self, key):
+        try:
+            _, weight = self.entries.pop(key)
+        except KeyError:
+            pass
+        else:
+            self.size -= weight
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    @property
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries), "size": self.size}
+
+
+MISSING = object()
+
+HTML_FORMATTER = HtmlFormatter()
+PYGMENTS_LEXERS = LRUCache(256)
+
+
+def pygments_lexer(name):
+    lexer = PYGMENTS_LEXERS.get(name, MISSING)
+    if lexer is MISSING:
+        try:
+            lexer = get_lexer_by_name(name)
+        except ClassNotFound:
+            lexer = None
+        PYGMENTS_LEXERS.put(name, lexer)
+    return lexer
+
+
+SLUG_SEPARATORS = re.compile("[^0-9A-Za-z]+")
+SLUGS = LRUCache(4096)
+SLUG_CACHE_LIMIT = 256
+
+
+def slug(text):
+    value = SLUGS.get(text)
+    if value is None:
+        value = SLUG_SEPARATORS.sub("-", text).strip("-").lower()
+        if len(text) <= SLUG_CACHE_LIMIT:
+            SLUGS.put(text, value)
+    return value
+
+
+class HighlightCache(LRUCache):
+
+    def __init__(self, max_size, directory=None):
+        LRUCache.__init__(self, max_size, weigher=len)
+        self.directory = directory
+
+    @staticmethod
+    def key(source, lang, metadata):
+        digest = sha1()
+        for part in (pygments_version, lang, metadata, source):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".html")
+
+    def load(self, key):
+        if self.directory:
+            try:
+                with open(self.path(key), encoding="utf-8") as f:
+                    return f.read()
+            except (OSError, ValueError):
+                pass
+        return None
+
+    def save(self, key, html):
+        if self.directory:
+            path = self.path(key)
+            directory = os.path.dirname(path)
+            f = None
+            try:
+                os.makedirs(directory, exist_ok=True)
+                with NamedTemporaryFile("w", encoding="utf-8", dir=directory, delete=False) as f:
+                    f.write(html)
+                os.replace(f.name, path)
+            except OSError:
+                if f is not None:
+                    try:
+                        os.remove(f.name)
+                    except OSError:
+                        pass
+
+    def highlight(self, source, lexer, lang, metadata):
+        key = self.key(source, lang, metadata)
+        html = self.get(key)
+        if html is None:
+            html = self.load(key)
+            if html is None:
+                html = highlight(source, lexer, HTML_FORMATTER)
+                self.save(key, html)
+            self.put(key, html)
+        return html
+
+
+HIGHLIGHT_CACHE = HighlightCache(max_size=8 * 1024 * 1024)
+
+
+def configure_highlight_cache(directory):
+    HIGHLIGHT_CACHE.directory = directory
+    return HIGHLIGHT_CACHE
+
+
+CachedPage = namedtuple("CachedPage", ["body", "etag", "last_modified"])
+
+
+class PageCache(LRUCache):
+
+    def __init__(self, max_bytes):
+        LRUCache.__init__(self, max_bytes, weigher=lambda page: len(page.body))
+        self.stamps = {}
+
+    @staticmethod
+    def stamp(stat, template_stat):
+        return stat.st_mtime_ns, stat.st_size, template_stat.st_mtime_ns, template_stat.st_size, RENDERER
+
+    @staticmethod
+    def validators(stat, template_stat):
+        etag = '"%x-%x-%x-%x-%s"' % PageCache.stamp(stat, template_stat)
+        return etag, int(max(stat.st_mtime, template_stat.st_mtime))
+
+    def lookup(self, path, stat, template_stat):
+        return self.get((path, self.stamp(stat, template_stat)))
+
+    def store(self, path, stat, template_stat, chunks):
+        body = []
+        for chunk in chunks:
+            body.append(chunk)
+            yield chunk
+        stamp = self.stamp(stat, template_stat)
+        etag, last_modified = self.validators(stat, template_stat)
+        with self.lock:
+            old_stamp = self.stamps.get(path)
+            self.stamps[path] = stamp
+        if old_stamp is not None and old_stamp != stamp:
+            self.discard((path, old_stamp))
+        self.put((path, stamp), CachedPage("".join(body).encode("utf-8"), etag, last_modified))
+
+
+def not_modified(etag, last_modified=None):
+    if_none_match = request.environ.get("HTTP_IF_NONE_MATCH")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.environ.get("HTTP_IF_MODIFIED_SINCE")
+    if if_modified_since is not None and last_modified is not None:
+        since = parse_date(if_modified_since.split(";")[0].strip())
+        return since is not None and since >= last_modified
+    return False
+
+
+Stylesheet = namedtuple("Stylesheet", ["css", "gzipped", "etag"])
+
+
+def stylesheet(style):
+    try:
+        return STYLESHEETS[style]
+    except KeyError:
+        css = HtmlFormatter(style=style).get_style_defs(".highlight").encode("utf-8")
+        sheet = STYLESHEETS[style] = Stylesheet(css, gzip.compress(css, mtime=0), sha1(css).hexdigest())
+        return sheet
+
+
+def accepts_gzip():
+    for encoding in request.environ.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, _, params = encoding.partition(";")
+        if name.strip().lower() == "gzip":
+            params = params.replace(" ", "")
+            if params.startswith("q="):
+                try:
+                    return float(params[2:]) > 0
+                except ValueError:
+                    return False
+            return True
+    return False
+
+
+PYGMENTS_STYLE = "default"
+STYLESHEETS = {}
+
+CONTENT_DIR = "content"
+PAGE_CACHE = PageCache(max_bytes=32 * 1024 * 1024)
+
+BODY_PLACEHOLDER = "{{!body}}"
+def renderer_digest():
+    digest = sha1(pygments_version.encode("utf-8"))
+    with open(__file__, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+RENDERER = renderer_digest()
+PAGE_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "content.html")
+PAGE_TEMPLATES = {}
+
+
+def page_templates(name):
+    stat = os.stat(name)
+    key = (name, stat.st_mtime_ns, stat.st_size)
+    try:
+        return PAGE_TEMPLATES[key]
+    except KeyError:
+        with open(name, encoding="utf-8") as f:
+            head, _, tail = f.read().partition(BODY_PLACEHOLDER)
+        PAGE_TEMPLATES.clear()
+        templates = PAGE_TEMPLATES[key] = SimpleTemplate(head), SimpleTemplate(tail)
+        return templates
+
+
+def page(document):
+    head, tail = page_templates(PAGE_TEMPLATE)
+    values = {"title": document.title, "toc": document.toc_html}
+    yield head.render(**values)
+    for chunk in document.iter_html():
+        yield chunk
+    yield tail.render(**values)
+
+
+CompileResult = namedtuple("CompileResult", ["path", "output", "seconds", "error"])
+
+
+def output_path(path, out_dir):
+    name, _ = os.path.splitext(os.path.basename(path))
+    return os.path.join(out_dir, "%s.html" % name)
+
+
+def file_mode():
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def write_file(path, text):
+    f = NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(path), delete=False)
+    try:
+        with f:
+            f.write(text)
+        os.chmod(f.name, file_mode())
+        os.replace(f.name, path)
+    except BaseException:
+        try:
+            os.remove(f.name)
+        except OSError:
+            pass
+        raise
+
+
+def compile_file(path, out_dir, limits=None):
+    output = output_path(path, out_dir)
+    start = default_timer()
+    try:
+        document = Document(limits=limits)
+        document.parse_file(path)
+        write_file(output, "".join(page(document)))
+    except Exception as error:
+        return CompileResult(path, None, default_timer() - start, "%s: %s" % (type(error).__name__, error))
+    return CompileResult(path, output, default_timer() - start, None)
+
+
+def output_clashes(paths, out_dir):
+    owners = {}
+    clashes = {}
+    for i, path in enumerate(paths):
+        output = os.path.normcase(os.path.abspath(output_path(path, out_dir)))
+        if output in owners:
+            clashes[i] = CompileResult(path, None, 0.0, "OutputClash: %s is also written by %s" % (
+                output_path(path, out_dir), paths[owners[output]]))
+        else:
+            owners[output] = i
+    return clashes
+
+
+def compile_many(paths, out_dir, workers=None, limits=None, highlight_dir=None):
+    paths = list(paths)
+    os.makedirs(out_dir, exist_ok=True)
+    if highlight_dir is not None:
+        configure_highlight_cache(highlight_dir)
+    clashes = output_clashes(paths, out_dir)
+    pending = [path for i, path in enumerate(paths) if i not in clashes]
+    if workers == 1 or len(pending) <= 1:
+        compiled = [compile_file(path, out_dir, limits) for path in pending]
+    else:
+        workers = workers or os.cpu_count() or 1
+        chunk_size = max(1, len(pending) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers, initializer=configure_highlight_cache,
+                                 initargs=(HIGHLIGHT_CACHE.directory,)) as executor:
+            compiled = list(executor.map(compile_file, pending, repeat(out_dir), repeat(limits),
+                                         chunksize=chunk_size))
+    compiled = iter(compiled)
+    return [clashes[i] if i in clashes else next(compiled) for i in range(len(paths))]
+
+
 @get("/<name>")
 def content(name):
+    path = os.path.join(CONTENT_DIR, "%s.syntaq" % name)
     try:
-        with open("content/%s.syntaq" % name) as f:
-            source = f.read()
-            document = Document()
-            document.parse(source)
-            return template("templates/content.html", title=document.title, body=document.html)
+        stat = os.stat(path)
     except FileNotFoundError:
         abort(404)
+    template_stat = os.stat(PAGE_TEMPLATE)
+    cached = PAGE_CACHE.lookup(path, stat, template_stat)
+    if cached is None:
+        etag, last_modified = PageCache.validators(stat, template_stat)
+    else:
+        etag, last_modified = cached.etag, cached.last_modified
+    headers = {"ETag": etag, "Last-Modified": http_date(last_modified)}
+    if not_modified(etag, last_modified):
+        return HTTPResponse(status=304, **headers)
+    for key, value in headers.items():
+        response.set_header(key, value)
+    if cached is not None:
+        return cached.body
+    document = Document()
+    document.parse_file(path)
+    return PAGE_CACHE.store(path, stat, template_stat, page(document))
+
+
+def pygments_stylesheet(style):
+    try:
+        sheet = stylesheet(style)
+    except ClassNotFound:
+        abort(404)
+    headers = {
+        "Content-Type": "text/css",
+        "Cache-Control": "public, max-age=86400",
+        "Vary": "Accept-Encoding",
+    }
+    if accepts_gzip():
+        body, etag = sheet.gzipped, '"%s-gzip"' % sheet.etag
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body, etag = sheet.css, '"%s"' % sheet.etag
+    headers["ETag"] = etag
+    if not_modified(etag):
+        return HTTPResponse(status=304, **headers)
+    return HTTPResponse(body, **headers)
 
 
 @get("/_style/pygments.css")
 def pygments_style():
-    response.content_type = "text/css"
-    return HtmlFormatter().get_style_defs('.highlight')
+    return pygments_stylesheet(PYGMENTS_STYLE)
+
+
+@get("/_style/pygments/<style>.css")
+def pygments_themed_style(style):
+    return pygments_stylesheet(style)
 
 
 @get("/_style/<name>.css")
@@ -654,5 +1851,35 @@ def style(name):
     return static_file("%s.css" % name, "style")
 
 
-if __name__ == "__main__":
+def main(args=None):
+    parser = ArgumentParser(prog="syntaq")
+    commands = parser.add_subparsers(dest="command")
+    serve_command = commands.add_parser("serve")
+    serve_command.add_argument("--highlight-cache", metavar="DIR", default=None)
+    compile_command = commands.add_parser("compile")
+    compile_command.add_argument("--highlight-cache", metavar="DIR", default=None)
+    compile_command.add_argument("paths", nargs="+")
+    compile_command.add_argument("-o", "--out-dir", default="html")
+    compile_command.add_argument("-j", "--workers", type=int, default=None)
+    options = parser.parse_args(args)
+    if options.command == "compile":
+        results = compile_many(options.paths, options.out_dir, workers=options.workers,
+                               highlight_dir=options.highlight_cache)
+        failures = 0
+        for result in results:
+            if result.error is None:
+                print("%s -> %s (%.1f ms)" % (result.path, result.output, 1000 * result.seconds))
+            else:
+                failures += 1
+                print("%s !! %s" % (result.path, result.error))
+        print("%d compiled, %d failed in %.1f ms" % (len(results) - failures, failures,
+                                                      1000 * sum(result.seconds for result in results)))
+        return 1 if failures else 0
+    if getattr(options, "highlight_cache", None):
+        configure_highlight_cache(options.highlight_cache)
     run(reloader=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from random import Random
+from unittest import TestCase
+
+from syntaq import URI_PATTERN, auto_link, uri_spans
+
+
+FRAGMENTS = ["http", "https", "ftp", "mailto:", "www", "www2", "WWW", ".", "/", "//", ":", "(", ")", "(a)",
+             "a", "b", "1", " ", "\n", ",", "!", "'", "?", "#", "=", "-", "_", "%", "~", "[", "]", "<", ">",
+             "com", "org", "x.de/", "ab:", "a-b", "«", "é", "ı"]
+
+
+class AutoLinkTestCase(TestCase):
+
+    def test_text_without_links(self):
+        assert auto_link("foo & bar") == "foo &amp; bar"
+
+    def test_text_with_link(self):
+        assert auto_link("see http://example.com/foo.") == \
+            'see <a href="http://example.com/foo">http://example.com/foo</a>.'
+
+    def test_text_with_www_link(self):
+        assert auto_link("see www.example.com") == 'see <a href="www.example.com">www.example.com</a>'
+
+    def test_text_with_domain_link(self):
+        assert auto_link("see foo.de/bar!") == 'see <a href="foo.de/bar">foo.de/bar</a>!'
+
+    def test_link_with_balanced_parentheses(self):
+        assert auto_link("(http://example.com/foo_(bar))") == \
+            '(<a href="http://example.com/foo_(bar)">http://example.com/foo_(bar)</a>)'
+
+    def test_spans_match_regular_expression(self):
+        rng = Random(0)
+        for _ in range(20000):
+            text = "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 8)))
+            assert uri_spans(text) == [match.span() for match in URI_PATTERN.finditer(text)], text
+
+    def test_spans_match_regular_expression_on_bundled_content(self):
+        for name in ("full", "syntaq-markup-language"):
+            with open("content/%s.syntaq" % name) as f:
+                text = f.read()
+            assert uri_spans(text) == [match.span() for match in URI_PATTERN.finditer(text)]
+
+    def test_long_run_of_trailing_punctuation(self):
+        assert uri_spans("http://" + "." * 10000) == []
+
+    def test_long_run_of_unbalanced_parentheses(self):
+        assert uri_spans("http://x" + "(a" * 10000 + " ") == [(0, 8)]
+
+    def test_long_run_of_balanced_parentheses(self):
+        assert uri_spans("http://x" + "(a)" * 10000 + ".") == [(0, 8 + 3 * 10000)]
+
+    def test_long_run_of_scheme_like_words(self):
+        text = "ab:" * 10000
+        assert uri_spans(text) == [(0, len(text) - 1)]
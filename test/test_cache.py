@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+import syntaq
+from syntaq import HighlightCache, LRUCache, PYGMENTS_LEXERS, configure_highlight_cache, pygments_lexer
+
+
+class LRUCacheTestCase(TestCase):
+
+    def test_can_get_stored_value(self):
+        cache = LRUCache(10)
+        cache.put("foo", "bar")
+        assert cache.get("foo") == "bar"
+
+    def test_missing_value_returns_default(self):
+        cache = LRUCache(10)
+        assert cache.get("foo") is None
+        assert cache.get("foo", "bar") == "bar"
+
+    def test_counts_hits_and_misses(self):
+        cache = LRUCache(10)
+        cache.put("foo", "bar")
+        cache.get("foo")
+        cache.get("baz")
+        assert cache.stats["hits"] == 1
+        assert cache.stats["misses"] == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+
+    def test_evicts_by_weight(self):
+        cache = LRUCache(10, weigher=len)
+        cache.put("a", "xxxx")
+        cache.put("b", "xxxx")
+        cache.put("c", "xxxx")
+        assert "a" not in cache
+        assert cache.size == 8
+
+    def test_does_not_store_value_larger_than_budget(self):
+        cache = LRUCache(3, weigher=len)
+        cache.put("a", "xxxx")
+        assert len(cache) == 0
+        assert cache.size == 0
+
+    def test_replacing_value_updates_size(self):
+        cache = LRUCache(10, weigher=len)
+        cache.put("a", "xxxx")
+        cache.put("a", "xx")
+        assert cache.size == 2
+
+
+class PygmentsLexerTestCase(TestCase):
+
+    def setUp(self):
+        PYGMENTS_LEXERS.clear()
+
+    def test_lexer_is_reused(self):
+        assert pygments_lexer("python") is pygments_lexer("python")
+
+    def test_unknown_lexer_is_none(self):
+        assert pygments_lexer("no-such-language") is None
+
+    def test_unknown_lexer_is_cached(self):
+        pygments_lexer("no-such-language")
+        hits = PYGMENTS_LEXERS.hits
+        pygments_lexer("no-such-language")
+        assert PYGMENTS_LEXERS.hits == hits + 1
+        assert "no-such-language" in PYGMENTS_LEXERS
+
+
+class HighlightCacheTestCase(TestCase):
+
+    source = "print('hello, world')\n"
+
+    def setUp(self):
+        self.directory = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_highlighted_html_is_cached(self):
+        cache = HighlightCache(1024 * 1024)
+        lexer = pygments_lexer("python")
+        first = cache.highlight(self.source, lexer, "python", "")
+        second = cache.highlight(self.source, lexer, "python", "")
+        assert first == second
+        assert cache.stats["hits"] == 1
+        assert cache.stats["misses"] == 1
+
+    def test_key_depends_on_language_and_metadata(self):
+        keys = {HighlightCache.key(self.source, "python", ""),
+                HighlightCache.key(self.source, "python3", ""),
+                HighlightCache.key(self.source, "python", "foo")}
+        assert len(keys) == 3
+
+    def test_highlighted_html_is_shared_through_directory(self):
+        lexer = pygments_lexer("python")
+        html = HighlightCache(1024 * 1024, self.directory).highlight(self.source, lexer, "python", "")
+        cache = HighlightCache(1024 * 1024, self.directory)
+        key = HighlightCache.key(self.source, "python", "")
+        assert cache.load(key) == html
+        assert cache.highlight(self.source, None, "python", "") == html
+
+    def test_unusable_directory_falls_back_to_memory(self):
+        blocker = os.path.join(self.directory, "file")
+        with open(blocker, "w") as f:
+            f.write("not a directory")
+        lexer = pygments_lexer("python")
+        expected = HighlightCache(1024 * 1024).highlight(self.source, lexer, "python", "")
+        cache = HighlightCache(1024 * 1024, os.path.join(blocker, "cache"))
+        assert cache.highlight(self.source, lexer, "python", "") == expected
+
+    def test_failed_save_leaves_no_temporary_file(self):
+        cache = HighlightCache(1024 * 1024, self.directory)
+        key = HighlightCache.key(self.source, "python", "")
+        os.makedirs(cache.path(key))
+        cache.save(key, "<pre></pre>")
+        assert os.listdir(os.path.dirname(cache.path(key))) == [os.path.basename(cache.path(key))]
+        assert cache.load(key) is None
+
+    def test_configure_highlight_cache(self):
+        previous = syntaq.HIGHLIGHT_CACHE.directory
+        try:
+            assert configure_highlight_cache(self.directory) is syntaq.HIGHLIGHT_CACHE
+            assert syntaq.HIGHLIGHT_CACHE.directory == self.directory
+        finally:
+            configure_highlight_cache(previous)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+import syntaq
+from syntaq import Document, compile_many, configure_highlight_cache, file_mode, main, page, write_file
+
+
+class CompileManyTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.out_dir = os.path.join(self.directory, "html")
+        self.paths = []
+        for i in range(6):
+            path = os.path.join(self.directory, "page%d.syntaq" % i)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("= Page %d\n\n**bold** %d\n\n``` python\nx = %d\n```\n" % (i, i, i))
+            self.paths.append(path)
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def expected(self, path):
+        document = Document()
+        with open(path, encoding="utf-8") as f:
+            document.parse(f.read())
+        return "".join(page(document))
+
+    def check(self, results):
+        assert [result.path for result in results] == self.paths
+        for result in results:
+            assert result.error is None
+            assert result.seconds >= 0
+            with open(result.output, encoding="utf-8") as f:
+                assert f.read() == self.expected(result.path)
+
+    def test_sequential(self):
+        self.check(compile_many(self.paths, self.out_dir, workers=1))
+
+    def test_process_pool(self):
+        self.check(compile_many(self.paths, self.out_dir, workers=2))
+
+    def test_errors_are_reported_per_file(self):
+        missing = os.path.join(self.directory, "missing.syntaq")
+        results = compile_many([missing] + self.paths, self.out_dir, workers=2)
+        assert results[0].output is None
+        assert results[0].error.startswith("FileNotFoundError")
+        assert all(result.error is None for result in results[1:])
+
+    def test_highlight_cache_directory_is_shared_with_workers(self):
+        highlight_dir = os.path.join(self.directory, "highlight")
+        previous = syntaq.HIGHLIGHT_CACHE.directory
+        syntaq.HIGHLIGHT_CACHE.clear()
+        try:
+            self.check(compile_many(self.paths, self.out_dir, workers=2, highlight_dir=highlight_dir))
+        finally:
+            configure_highlight_cache(previous)
+        assert len(os.listdir(highlight_dir)) > 0
+
+    def test_output_files_get_the_default_mode(self):
+        for result in compile_many(self.paths, self.out_dir, workers=1):
+            assert os.stat(result.output).st_mode & 0o777 == file_mode()
+
+    def test_failed_write_leaves_no_temporary_file(self):
+        os.makedirs(self.out_dir)
+        with self.assertRaises(UnicodeEncodeError):
+            write_file(os.path.join(self.out_dir, "bad.html"), u"\ud800")
+        assert os.listdir(self.out_dir) == []
+
+    def test_compile_outside_the_repository(self):
+        cwd = os.getcwd()
+        os.chdir(self.directory)
+        try:
+            self.check(compile_many(self.paths, self.out_dir, workers=1))
+        finally:
+            os.chdir(cwd)
+
+    def test_command_line(self):
+        status = main(["compile", "-j", "2", "-o", self.out_dir] + self.paths)
+        assert status == 0
+        assert sorted(os.listdir(self.out_dir)) == ["page%d.html" % i for i in range(6)]
+
+    def test_inputs_with_the_same_output_are_reported(self):
+        other = os.path.join(self.directory, "other")
+        os.mkdir(other)
+        clash = os.path.join(other, "page1.syntaq")
+        with open(clash, "w", encoding="utf-8") as f:
+            f.write("= Other\n")
+        for workers in (1, 2):
+            results = compile_many(self.paths + [clash], self.out_dir, workers=workers)
+            self.check(results[:-1])
+            assert results[-1].path == clash
+            assert results[-1].output is None
+            assert results[-1].error.startswith("OutputClash")
+            assert self.paths[1] in results[-1].error
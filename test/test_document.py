@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import StringIO
+from unittest import TestCase
+
+from syntaq import Document, Parser, Stats
+
+
+SOURCE = "= Title\n\nfoo **bar**\n\n* baz\n* qux\n\n|spam|eggs|\n"
+
+
+class DocumentStreamingTestCase(TestCase):
+
+    def test_iter_html_yields_one_chunk_per_block(self):
+        document = Document()
+        document.parse(SOURCE)
+        chunks = list(document.iter_html())
+        assert chunks == ["<h1>Title</h1>",
+                          "<p>foo <strong>bar</strong></p>",
+                          "<ul><li>baz</li><li>qux</li></ul>",
+                          "<table><tr><td>spam</td><td>eggs</td></tr></table>"]
+
+    def test_iter_html_matches_html(self):
+        document = Document()
+        document.parse(SOURCE)
+        assert "".join(document.iter_html()) == document.html
+
+    def test_can_render_to_file_object(self):
+        document = Document()
+        document.parse(SOURCE)
+        out = StringIO()
+        document.render(out)
+        assert out.getvalue() == document.html
+
+
+class DocumentStatsTestCase(TestCase):
+
+    source = SOURCE + "\n``` python\nprint('hello')\n```\n\nsee http://example.com/\n"
+
+    def test_stats_record_parse_and_render_stages(self):
+        stats = Stats()
+        document = Document(stats=stats)
+        document.parse(self.source)
+        document.html
+        recorded = stats.as_dict()
+        for stage in ("parse.Heading", "parse.ListItem", "parse.TableRow", "parse.Literal", "parse.paragraph",
+                      "render.Heading", "render.ListItem", "render.TableRow", "render.Literal", "render.paragraph",
+                      "lex", "auto_link", "highlight"):
+            assert stage in recorded, stage
+        assert recorded["render.paragraph"]["calls"] == 2
+        assert recorded["parse.ListItem"]["calls"] == 2
+
+    def test_stats_do_not_change_output(self):
+        with_stats = Document(stats=Stats())
+        with_stats.parse(self.source)
+        without_stats = Document()
+        without_stats.parse(self.source)
+        assert without_stats.html == with_stats.html
+
+    def test_parsing_does_not_lex_inline_text(self):
+        stats = Stats()
+        document = Document(stats=stats)
+        document.parse(self.source)
+        assert "lex" not in stats.as_dict()
+        assert document.title == "Title"
+        assert stats.as_dict()["lex"]["calls"] == 1
+
+    def test_rendering_with_stats_does_not_keep_spans(self):
+        document = Document(stats=Stats())
+        document.parse(self.source)
+        document.html
+        paragraph = [block for block in document.parser.blocks if block.content_type is None][0]
+        assert paragraph.text.lexed is None
+
+    def test_stats_can_be_cleared(self):
+        stats = Stats()
+        document = Document(stats=stats)
+        document.parse(self.source)
+        stats.clear()
+        assert stats.as_dict() == {}
+
+    def test_shared_stats_keep_every_call(self):
+        stats = Stats()
+
+        def add(_):
+            for _ in range(10000):
+                stats.add("render", 0.5)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(8) as executor:
+                list(executor.map(add, range(8)))
+        finally:
+            sys.setswitchinterval(interval)
+        assert stats.as_dict() == {"render": {"calls": 80000, "seconds": 40000.0}}
+
+
+class UnusableExecutor(object):
+
+    def map(self, *args, **kwargs):
+        raise AssertionError("executor should not be used")
+
+
+class ParallelRenderTestCase(TestCase):
+
+    source = "\n\n".join("= Section %d\n\nSome **text** %d.\n\n```python\nx = %d\n```" % (i, i, i)
+                         for i in range(40))
+
+    def render(self, **kwargs):
+        document = Document(**kwargs)
+        document.parse(self.source)
+        return document.html
+
+    def test_threads_match_sequential_output(self):
+        with ThreadPoolExecutor(4) as executor:
+            assert self.render(executor=executor, parallel_threshold=1) == self.render()
+
+    def test_processes_match_sequential_output(self):
+        with ProcessPoolExecutor(2) as executor:
+            assert self.render(executor=executor, parallel_threshold=1) == self.render()
+
+    def test_small_documents_stay_sequential(self):
+        assert self.render(executor=UnusableExecutor(), parallel_threshold=1000) == self.render()
+
+
+class IncrementalRenderTestCase(TestCase):
+
+    source = "= Title\n\nfirst paragraph\n\n* one\n* two\n\n```python\nx = 1\n```\n\nlast paragraph\n"
+
+    def html(self, source):
+        document = Document()
+        document.parse(source)
+        return document.html
+
+    def test_first_update_renders_every_block(self):
+        document = Document()
+        assert document.update(self.source) == [0, 1, 2, 3, 4]
+        assert document.html == self.html(self.source)
+
+    def test_unchanged_source_renders_nothing(self):
+        document = Document()
+        document.update(self.source)
+        assert document.update(self.source) == []
+        assert document.html == self.html(self.source)
+
+    def test_only_edited_block_is_rendered(self):
+        document = Document()
+        document.update(self.source)
+        edited = self.source.replace("first paragraph", "first **edited** paragraph")
+        assert document.update(edited) == [1]
+        assert document.html == self.html(edited)
+
+    def test_inserted_block_is_rendered(self):
+        document = Document()
+        document.update(self.source)
+        edited = self.source.replace("* one", "new paragraph\n\n* one")
+        assert document.update(edited) == [2]
+        assert document.html == self.html(edited)
+
+    def test_literal_metadata_is_part_of_fingerprint(self):
+        document = Document()
+        document.update(self.source)
+        edited = self.source.replace("```python", "```ruby")
+        assert document.update(edited) == [3]
+        assert document.html == self.html(edited)
+
+
+class DocumentIRTestCase(TestCase):
+
+    def setUp(self):
+        self.document = Document()
+        with open("content/syntaq-markup-language.syntaq") as f:
+            self.document.parse(f.read())
+
+    def test_round_trip_renders_identically(self):
+        loaded = Document.loads(self.document.dumps())
+        assert loaded.title == self.document.title
+        assert loaded.html == self.document.html
+
+    def test_loading_does_not_lex(self):
+        stats = Stats()
+        Document.loads(self.document.dumps(), stats=stats).html
+        assert "lex" not in stats.as_dict()
+
+    def test_fingerprints_survive_round_trip(self):
+        loaded = Document.loads(self.document.dumps())
+        assert [block.fingerprint for block in loaded.parser.blocks] == \
+               [block.fingerprint for block in self.document.parser.blocks]
+
+    def test_unknown_version_is_rejected(self):
+        ir = self.document.to_ir()
+        ir["version"] = 0
+        with self.assertRaises(ValueError):
+            Document.from_ir(ir)
+
+
+class TableOfContentsTestCase(TestCase):
+
+    source = "= Title\n\nintro\n\n== One\n\ntext\n\n=== One A\n\n== Two\n\n==== Deep\n\n== One\n"
+
+    def setUp(self):
+        self.document = Document()
+        self.document.parse(self.source)
+
+    def test_outline_entries(self):
+        entries = [(entry.level, entry.text.source, entry.id, entry.offset) for entry in self.document.toc]
+        assert entries == [(1, "Title", None, 0), (2, "One", "one", 2), (3, "One A", "one-a", 4),
+                           (2, "Two", "two", 5), (4, "Deep", "deep", 6), (2, "One", "one-2", 7)]
+
+    def test_offsets_point_at_heading_blocks(self):
+        blocks = self.document.parser.blocks
+        for entry in self.document.toc:
+            assert blocks[entry.offset].lines[0].text is entry.text
+
+    def test_offsets_survive_streaming(self):
+        parser = Parser(retain=False)
+        for line in self.source.splitlines(True):
+            parser.feed(line)
+        parser.close()
+        assert [entry.offset for entry in parser.outline] == [entry.offset for entry in self.document.toc]
+
+    def test_toc_html(self):
+        assert self.document.toc_html == (
+            '<ul><li>Title<ul>'
+            '<li><a href="#one">One</a><ul><li><a href="#one-a">One A</a></li></ul></li>'
+            '<li><a href="#two">Two</a><ul><li><a href="#deep">Deep</a></li></ul></li>'
+            '<li><a href="#one-2">One</a></li>'
+            '</ul></li></ul>')
+
+    def test_empty_toc_html(self):
+        document = Document()
+        document.parse("no headings here")
+        assert document.toc_html == ""
+
+    def test_building_outline_does_not_lex(self):
+        stats = Stats()
+        document = Document(stats=stats)
+        document.parse(self.source)
+        assert [entry.id for entry in document.toc][1:] == ["one", "one-a", "two", "deep", "one-2"]
+        assert "lex" not in stats.as_dict()
+
+    def test_outline_survives_ir_round_trip(self):
+        loaded = Document.loads(self.document.dumps())
+        assert loaded.toc_html == self.document.toc_html
+        assert [entry.offset for entry in loaded.toc] == [entry.offset for entry in self.document.toc]
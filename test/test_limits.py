@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from unittest import TestCase
+
+from syntaq import Document, LimitExceeded, Limits, Text
+
+
+def render(source, **limits):
+    document = Document(limits=Limits(**limits))
+    document.parse(source)
+    return document.html
+
+
+class LimitsTestCase(TestCase):
+
+    def test_no_limits_changes_nothing(self):
+        source = "= Title\n\n* one\n** two\n\n|a|b|\n\n//x **y** [[z|w]]//\n"
+        document = Document()
+        document.parse(source)
+        assert render(source) == document.html
+
+    def test_input_over_budget_is_rejected(self):
+        with self.assertRaises(LimitExceeded):
+            render("x" * 101, max_input_bytes=100)
+
+    def test_input_budget_counts_encoded_bytes(self):
+        with self.assertRaises(LimitExceeded):
+            render(u"é" * 60, max_input_bytes=100)
+        assert render(u"é" * 50, max_input_bytes=100)
+
+    def test_input_budget_spans_feeds(self):
+        document = Document(limits=Limits(max_input_bytes=10))
+        document.parser.feed("12345\n")
+        with self.assertRaises(LimitExceeded):
+            document.parser.feed("67890\n")
+
+    def test_too_many_inline_tokens_renders_as_text(self):
+        html = render("**a** **b** **c**", max_inline_tokens=4)
+        assert html == "<p>**a** **b** **c**</p>"
+
+    def test_inline_token_cap_stops_lexing(self):
+        assert len(Text("**a** " * 100000).lex(5)) == 5
+        assert render("**a** " * 100000, max_inline_tokens=4).startswith("<p>**a** **a**")
+
+    def test_inline_tokens_within_budget_render_as_markup(self):
+        html = render("**a**", max_inline_tokens=4)
+        assert html == "<p><strong>a</strong></p>"
+
+    def test_inline_nesting_is_capped(self):
+        html = render("[[a|[[b|[[c|d]]]]]]", max_nesting=2)
+        assert html.count("<a ") == 2
+        assert html.startswith("<p>")
+
+    def test_deep_list_items_fall_back_to_plain_text(self):
+        html = render("* one\n** two\n*** three", max_nesting=2)
+        assert "<li>two</li>" in html
+        assert html.endswith("</ul></ul><p>*** three</p>")
+
+    def test_deep_list_items_are_not_lexed(self):
+        html = render("* a\n** b **c**", max_nesting=1)
+        assert html == "<ul><li>a</li></ul><p>** b **c**</p>"
+
+    def test_table_cells_are_capped(self):
+        html = render("|a|b|\n|c|d|", max_cells=3)
+        assert "<td>b</td>" in html
+        assert "<p>|c|d|</p>" in html
+
+    def test_table_rows_over_cap_are_escaped_text(self):
+        html = render("|a|\n|**b**|<i>|", max_cells=1)
+        assert html.endswith("<p>|**b**|&lt;i&gt;|</p>")
+
+    def test_parse_time_budget(self):
+        with self.assertRaises(LimitExceeded):
+            render("line\n" * 1000, time_budget=-1)
+
+    def test_parse_and_render_share_one_time_budget(self):
+        document = Document(limits=Limits(time_budget=0.05))
+        document.parse("hello")
+        document.parser.deadline -= 1
+        with self.assertRaises(LimitExceeded):
+            document.html
+
+    def test_render_time_budget(self):
+        document = Document(limits=Limits(time_budget=-1))
+        parsed = Document()
+        parsed.parse("hello")
+        document.parser.blocks.extend(parsed.parser.blocks)
+        with self.assertRaises(LimitExceeded):
+            document.html
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+from random import Random
+from tempfile import NamedTemporaryFile
+from unittest import TestCase
+
+import syntaq
+from syntaq import Document, Parser, slug
+
+
+def render(blocks):
+    document = Document()
+    return "".join(document.block_html(block) for block in blocks)
+
+
+class ParserFeedTestCase(TestCase):
+
+    def setUp(self):
+        with open("content/full.syntaq") as f:
+            self.source = f.read()
+        parser = Parser()
+        parser.parse(self.source)
+        self.expected = render(parser.blocks)
+
+    def test_feeding_random_chunks_matches_parse(self):
+        rng = Random(0)
+        for _ in range(20):
+            parser = Parser()
+            p = 0
+            while p < len(self.source):
+                q = p + rng.randint(1, 40)
+                parser.feed(self.source[p:q])
+                p = q
+            parser.close()
+            assert render(parser.blocks) == self.expected
+
+    def test_feed_returns_completed_blocks(self):
+        parser = Parser()
+        assert parser.feed("foo\nbar\n") == []
+        blocks = parser.feed("\nbaz")
+        assert [block.lines for block in blocks] == [["foo", "bar"]]
+        blocks = parser.close()
+        assert [block.lines for block in blocks] == [["baz"]]
+
+    def test_partial_line_is_held_until_complete(self):
+        parser = Parser()
+        parser.feed("= Hea")
+        parser.feed("ding\n")
+        parser.close()
+        assert parser.blocks[0].lines[0].text.source == "Heading"
+
+    def test_carriage_return_line_feed_across_chunks(self):
+        parser = Parser()
+        parser.feed("foo\r")
+        parser.feed("\nbar\r\n")
+        parser.close()
+        assert [block.lines for block in parser.blocks] == [["foo", "bar"]]
+
+    def test_long_line_fed_in_pieces(self):
+        parser = Parser()
+        for _ in range(100000):
+            parser.feed("x")
+        assert len(parser.pending) == 100000
+        parser.feed("\r")
+        parser.feed("\ny\n")
+        parser.close()
+        assert [block.lines for block in parser.blocks] == [["x" * 100000, "y"]]
+
+    def test_parser_can_discard_emitted_blocks(self):
+        parser = Parser(retain=False)
+        emitted = []
+        for line in self.source.splitlines(True):
+            emitted.extend(parser.feed(line))
+            assert len(parser.blocks) == 0
+        emitted.extend(parser.close())
+        assert render(emitted) == self.expected
+
+
+class ParserFileTestCase(TestCase):
+
+    source = u"= Caf\u00e9\r\n\nna\u00efve **text**\r\n\n``` python\r\nx = '\u2603'\r\n```\r\n\n|a|\u00e9|\n"
+
+    def parse_file(self, data, chunk_size):
+        with NamedTemporaryFile("wb", delete=False) as f:
+            f.write(data)
+        try:
+            parser = Parser()
+            parser.parse_file(f.name, chunk_size=chunk_size)
+        finally:
+            os.remove(f.name)
+        return render(parser.blocks)
+
+    def test_parse_file_matches_parse(self):
+        parser = Parser()
+        parser.parse(self.source.replace("\r\n", "\n"))
+        expected = render(parser.blocks)
+        data = self.source.encode("utf-8")
+        for chunk_size in (1, 2, 3, 7, len(data), 1024 * 1024):
+            assert self.parse_file(data, chunk_size) == expected, chunk_size
+
+    def test_parse_empty_file(self):
+        assert self.parse_file(b"", 1024) == ""
+
+    def test_document_parse_file(self):
+        document = Document()
+        document.parse_file("content/syntaq-markup-language.syntaq")
+        with open("content/syntaq-markup-language.syntaq") as f:
+            expected = Document()
+            expected.parse(f.read())
+        assert document.title == expected.title
+        assert document.html == expected.html
+
+
+class TitleTestCase(TestCase):
+
+    def title(self, source):
+        parser = Parser()
+        parser.parse(source)
+        return parser.title
+
+    def test_no_headings_has_no_title(self):
+        assert self.title("foo\n") is None
+
+    def test_highest_level_heading_is_title(self):
+        assert self.title("== Sub\n= Main\n= Other\n") == "Main"
+
+    def test_empty_rendered_title_is_replaced(self):
+        assert self.title("== ~\n== Real\n") == "Real"
+        assert self.title("= ~\n== Real\n") == "Real"
+
+    def test_title_follows_headings_fed_after_access(self):
+        parser = Parser()
+        parser.feed("== Sub\n")
+        assert parser.title == "Sub"
+        parser.feed("= Main\n")
+        parser.close()
+        assert parser.title == "Main"
+
+
+class HeadingIdTestCase(TestCase):
+
+    def ids(self, source):
+        parser = Parser()
+        parser.parse(source)
+        return [block.lines[0].id for block in parser.blocks if block.lines[0].__class__.__name__ == "Heading"]
+
+    def test_slug(self):
+        assert slug("Hello, World!") == "hello-world"
+        assert slug(u"--Caf\u00e9 -- au lait--") == "caf-au-lait"
+        assert slug("!" * 10000) == ""
+
+    def test_slug_does_not_retain_long_or_unusual_text(self):
+        text = u"".join(chr(0x4e00 + i) for i in range(20000))
+        assert slug(text) == ""
+        assert text not in syntaq.SLUGS
+        assert slug(u"\u212a\u0130") == ""
+
+    def test_duplicate_headings_get_unique_ids(self):
+        assert self.ids("== Intro\n== Intro\n=== Intro\n") == ["intro", "intro-2", "intro-3"]
+
+    def test_suffixed_ids_do_not_collide_with_existing_ids(self):
+        assert self.ids("== A\n== A 2\n== A\n") == ["a", "a-2", "a-3"]
+
+    def test_empty_ids_are_not_deduplicated(self):
+        assert self.ids("== !\n== ?\n") == ["", ""]
+
+    def test_top_level_headings_have_no_id(self):
+        assert self.ids("= Title\n== Title\n") == [None, "title"]
+
+    def test_heading_html_uses_unique_id(self):
+        document = Document()
+        document.parse("== Intro\n\n== Intro\n")
+        assert 'id="intro-2"' in document.html
+        assert 'href="#intro-2"' in document.html
@@ -16,6 +16,7 @@
 # limitations under the License.
 
 
+from random import Random
 from unittest import TestCase
 
 from syntaq import Lexer
@@ -52,3 +53,46 @@ class PartitionerTestCase(TestCase):
         t = Lexer("~", "**")
         tokens = list(t.tokens("foo~bar"))
         assert tokens == ["foo~bar"]
+
+    def test_can_partition_with_uncompiled_lexer(self):
+        t = Lexer("~", "**", compiled=False)
+        tokens = list(t.tokens("foo~**bar**baz~qux"))
+        assert tokens == ["foo", "~**", "bar", "**", "baz~qux"]
+
+    def test_compiled_lexer_matches_uncompiled_lexer(self):
+        markers = ("**", "//", '"""', '""', "[[", "]]", "|", "~x")
+        compiled = Lexer("~", *markers)
+        uncompiled = Lexer("~", *markers, compiled=False)
+        rng = Random(0)
+        for _ in range(2000):
+            source = "".join(rng.choice('*/"[]|~x ab') for _ in range(rng.randint(0, 20)))
+            assert list(compiled.tokens(source)) == list(uncompiled.tokens(source))
+
+    def test_can_partition_into_spans(self):
+        t = Lexer("~", "**")
+        spans = list(t.spans("foo~**bar**baz~qux"))
+        assert spans == [(0, 3, None), (3, 6, "~"), (6, 9, None), (9, 11, "**"), (11, 18, None)]
+
+    def test_spans_cover_tokens(self):
+        markers = ("**", "//", '"""', '""', "[[", "]]", "|", "~x")
+        rng = Random(1)
+        for compiled in (True, False):
+            t = Lexer("~", *markers, compiled=compiled)
+            for _ in range(2000):
+                source = "".join(rng.choice('*/"[]|~x ab') for _ in range(rng.randint(0, 20)))
+                spans = list(t.spans(source))
+                assert [source[start:end] for start, end, _ in spans] == list(t.tokens(source))
+                for start, end, marker in spans:
+                    if marker == "~":
+                        assert source[start] == "~"
+                    elif marker is not None:
+                        assert source[start:end] == marker
+
+    def test_lexers_with_same_markers_share_pattern(self):
+        assert Lexer("~", "**", "//").regex is Lexer("~", "**", "//").regex
+
+    def test_shared_lexer_is_reused_for_same_markers(self):
+        assert Lexer.shared("~", "**", "//") is Lexer.shared("~", "**", "//")
+
+    def test_shared_lexer_is_distinct_for_different_markers(self):
+        assert Lexer.shared("~", "**", "//") is not Lexer.shared("~", "//", "**")
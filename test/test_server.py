@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2011-2016 Nigel Small
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gzip
+import os
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from wsgiref.util import setup_testing_defaults
+
+from bottle import default_app, template
+
+import syntaq
+from syntaq import Document, PageCache
+
+
+def get(path, headers=None):
+    environ = {}
+    setup_testing_defaults(environ)
+    environ["PATH_INFO"] = path
+    for key, value in (headers or {}).items():
+        environ["HTTP_" + key.upper().replace("-", "_")] = value
+    status = []
+
+    def start_response(status_line, headers, exc_info=None):
+        status.append((status_line, dict((key.lower(), value) for key, value in headers)))
+
+    body = b"".join(default_app()(environ, start_response))
+    status_line, headers = status[0]
+    return status_line, headers, body
+
+
+class ContentRouteTestCase(TestCase):
+
+    def test_can_render_content_page(self):
+        with open("content/full.syntaq") as f:
+            document = Document()
+            document.parse(f.read())
+        expected = template("templates/content.html", title=document.title, toc=document.toc_html,
+                            body=document.html)
+        status, headers, body = get("/full")
+        assert status == "200 OK"
+        assert body.decode("utf-8") == expected
+
+    def test_missing_page_is_not_found(self):
+        status, headers, body = get("/no-such-page")
+        assert status.startswith("404")
+
+
+class PageCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.content_dir, syntaq.CONTENT_DIR = syntaq.CONTENT_DIR, mkdtemp()
+        self.page_cache, syntaq.PAGE_CACHE = syntaq.PAGE_CACHE, PageCache(max_bytes=1024 * 1024)
+        self.page_template = syntaq.PAGE_TEMPLATE
+        syntaq.PAGE_TEMPLATE = os.path.join(syntaq.CONTENT_DIR, "content.html")
+        copyfile(self.page_template, syntaq.PAGE_TEMPLATE)
+        os.utime(syntaq.PAGE_TEMPLATE, (999999999, 999999999))
+        self.write("foo", "= Foo\n\nbar\n")
+
+    def tearDown(self):
+        rmtree(syntaq.CONTENT_DIR)
+        syntaq.CONTENT_DIR, syntaq.PAGE_CACHE = self.content_dir, self.page_cache
+        syntaq.PAGE_TEMPLATE = self.page_template
+
+    def write(self, name, source, mtime=1000000000):
+        path = os.path.join(syntaq.CONTENT_DIR, "%s.syntaq" % name)
+        with open(path, "w") as f:
+            f.write(source)
+        os.utime(path, (mtime, mtime))
+
+    def test_document_text_cannot_move_the_body(self):
+        self.write("marker", "= a\x00body\x00{{!body}}b\n\n== c\x00body\x00\n\nbody text\n")
+        _, _, body = get("/marker")
+        head, _, main = body.decode("utf-8").partition('<div id="main">')
+        assert "body text" not in head
+        assert "body text" in main
+
+    def test_second_request_is_served_from_cache(self):
+        _, _, first = get("/foo")
+        _, _, second = get("/foo")
+        assert first == second
+        assert syntaq.PAGE_CACHE.stats["misses"] == 1
+        assert syntaq.PAGE_CACHE.stats["hits"] == 1
+
+    def test_modified_file_is_rendered_again(self):
+        get("/foo")
+        self.write("foo", "= Foo\n\nbaz\n", mtime=1000000001)
+        _, _, body = get("/foo")
+        assert b"<p>baz</p>" in body
+        assert len(syntaq.PAGE_CACHE) == 1
+
+    def test_response_has_validators(self):
+        _, headers, _ = get("/foo")
+        assert headers["etag"].startswith('"')
+        assert headers["last-modified"] == "Sun, 09 Sep 2001 01:46:40 GMT"
+
+    def test_matching_etag_is_not_modified(self):
+        _, headers, _ = get("/foo")
+        status, _, body = get("/foo", {"If-None-Match": headers["etag"]})
+        assert status.startswith("304")
+        assert body == b""
+
+    def test_stale_etag_is_rendered(self):
+        status, _, _ = get("/foo", {"If-None-Match": '"stale"'})
+        assert status == "200 OK"
+
+    def test_unmodified_since_is_not_modified(self):
+        status, _, _ = get("/foo", {"If-Modified-Since": "Sun, 09 Sep 2001 01:46:40 GMT"})
+        assert status.startswith("304")
+
+    def test_modified_template_invalidates_validators_and_cache(self):
+        _, headers, _ = get("/foo")
+        with open(syntaq.PAGE_TEMPLATE, "a") as f:
+            f.write("<!-- changed -->\n")
+        os.utime(syntaq.PAGE_TEMPLATE, (1000000005, 1000000005))
+        status, new_headers, body = get("/foo", {"If-None-Match": headers["etag"]})
+        assert status == "200 OK"
+        assert new_headers["etag"] != headers["etag"]
+        assert new_headers["last-modified"] == "Sun, 09 Sep 2001 01:46:45 GMT"
+        assert body.endswith(b"<!-- changed -->\n")
+        status, _, _ = get("/foo", {"If-Modified-Since": "Sun, 09 Sep 2001 01:46:40 GMT"})
+        assert status == "200 OK"
+
+    def test_etag_includes_renderer(self):
+        _, headers, _ = get("/foo")
+        assert syntaq.RENDERER in headers["etag"]
+
+    def test_modified_since_is_rendered(self):
+        status, _, _ = get("/foo", {"If-Modified-Since": "Sun, 09 Sep 2001 01:46:39 GMT"})
+        assert status == "200 OK"
+
+
+class PygmentsStyleTestCase(TestCase):
+
+    def test_stylesheet_is_served_with_cache_headers(self):
+        status, headers, body = get("/_style/pygments.css")
+        assert status == "200 OK"
+        assert headers["content-type"] == "text/css"
+        assert headers["cache-control"].startswith("public")
+        assert b".highlight" in body
+
+    def test_stylesheet_is_generated_once(self):
+        get("/_style/pygments.css")
+        sheet = syntaq.STYLESHEETS[syntaq.PYGMENTS_STYLE]
+        get("/_style/pygments.css")
+        assert syntaq.STYLESHEETS[syntaq.PYGMENTS_STYLE] is sheet
+
+    def test_stylesheet_can_be_gzipped(self):
+        _, plain_headers, plain = get("/_style/pygments.css")
+        _, headers, body = get("/_style/pygments.css", {"Accept-Encoding": "gzip, deflate"})
+        assert headers["content-encoding"] == "gzip"
+        assert gzip.decompress(body) == plain
+        assert headers["etag"] != plain_headers["etag"]
+
+    def test_gzip_can_be_refused(self):
+        _, headers, _ = get("/_style/pygments.css", {"Accept-Encoding": "gzip;q=0"})
+        assert "content-encoding" not in headers
+
+    def test_matching_etag_is_not_modified(self):
+        _, headers, _ = get("/_style/pygments.css")
+        status, _, _ = get("/_style/pygments.css", {"If-None-Match": headers["etag"]})
+        assert status.startswith("304")
+
+    def test_can_serve_named_style(self):
+        _, _, default = get("/_style/pygments.css")
+        status, _, body = get("/_style/pygments/monokai.css")
+        assert status == "200 OK"
+        assert body != default
+
+    def test_unknown_style_is_not_found(self):
+        status, _, _ = get("/_style/pygments/no-such-style.css")
+        assert status.startswith("404")